@@ -0,0 +1,122 @@
+"""Precomputed attack tables indexed by square index (see `Square.index`)."""
+from typing import List, Iterable, Tuple, Dict
+
+from .board import Bitboard
+
+
+def _leaper_attacks(index: int, offsets: Iterable[Tuple[int, int]]) -> Bitboard:
+    file, rank = index & 7, index >> 3
+    return Bitboard(sum(
+        1 << ((file + df) | ((rank + dr) << 3))
+        for df, dr in offsets
+        if 0 <= file + df < 8 and 0 <= rank + dr < 8
+    ))
+
+
+KNIGHT_OFFSETS = [(m, n) for m in (-2, -1, 1, 2) for n in (-2, -1, 1, 2) if abs(m) + abs(n) == 3]
+KING_OFFSETS = [(m, n) for m in (-1, 0, 1) for n in (-1, 0, 1) if m != 0 or n != 0]
+
+KNIGHT_ATTACKS: List[Bitboard] = [_leaper_attacks(index, KNIGHT_OFFSETS) for index in range(64)]
+KING_ATTACKS: List[Bitboard] = [_leaper_attacks(index, KING_OFFSETS) for index in range(64)]
+# Squares attacked by pawn of given color standing on given square, indexed by color and square
+PAWN_ATTACKS: List[List[Bitboard]] = [
+    [_leaper_attacks(index, [(-1, 1), (1, 1)]) for index in range(64)],
+    [_leaper_attacks(index, [(-1, -1), (1, -1)]) for index in range(64)],
+]
+
+
+ROOK_DIRECTIONS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+BISHOP_DIRECTIONS = [(1, 1), (-1, 1), (1, -1), (-1, -1)]
+
+
+def _rider_attacks(index: int, occupied: Bitboard, directions: Iterable[Tuple[int, int]]) -> Bitboard:
+    """Slowly walks rays from given square until first occupied square (including it)."""
+    file, rank = index & 7, index >> 3
+    attacks = 0
+    for df, dr in directions:
+        f, r = file + df, rank + dr
+        while 0 <= f < 8 and 0 <= r < 8:
+            bit = 1 << (f | (r << 3))
+            attacks |= bit
+            if occupied & bit:
+                break
+            f, r = f + df, r + dr
+    return Bitboard(attacks)
+
+
+def _relevant_occupancy_mask(index: int, directions: Iterable[Tuple[int, int]]) -> Bitboard:
+    """Squares which occupancy affects rider attacks from given square (rays without the edge squares)."""
+    file, rank = index & 7, index >> 3
+    mask = 0
+    for df, dr in directions:
+        f, r = file + df, rank + dr
+        while 0 <= f + df < 8 and 0 <= r + dr < 8:
+            mask |= 1 << (f | (r << 3))
+            f, r = f + df, r + dr
+    return Bitboard(mask)
+
+
+def _rider_tables(directions: Iterable[Tuple[int, int]]) -> Tuple[List[Bitboard], List[Dict[int, Bitboard]]]:
+    """
+    Builds relevant occupancy masks and for every square table of attacks indexed by all subsets of its mask
+    (which is what PEXT or magic multiplication would compute as index).
+    """
+    directions = list(directions)
+    masks = [_relevant_occupancy_mask(index, directions) for index in range(64)]
+    tables = []
+    for index, mask in enumerate(masks):
+        table = {}
+        subset = 0
+        while True:
+            table[subset] = _rider_attacks(index, Bitboard(subset), directions)
+            subset = (subset - mask) & mask
+            if not subset:
+                break
+        tables.append(table)
+    return masks, tables
+
+
+ROOK_MASKS, _ROOK_ATTACKS = _rider_tables(ROOK_DIRECTIONS)
+BISHOP_MASKS, _BISHOP_ATTACKS = _rider_tables(BISHOP_DIRECTIONS)
+# Attacks of riders on empty board
+ROOK_RAYS: List[Bitboard] = [_ROOK_ATTACKS[index][0] for index in range(64)]
+BISHOP_RAYS: List[Bitboard] = [_BISHOP_ATTACKS[index][0] for index in range(64)]
+
+
+def rook_attacks(index: int, occupied: Bitboard) -> Bitboard:
+    """Squares attacked by rook on given square with given occupancy."""
+    return _ROOK_ATTACKS[index][occupied & ROOK_MASKS[index]]
+
+
+def bishop_attacks(index: int, occupied: Bitboard) -> Bitboard:
+    """Squares attacked by bishop on given square with given occupancy."""
+    return _BISHOP_ATTACKS[index][occupied & BISHOP_MASKS[index]]
+
+
+def queen_attacks(index: int, occupied: Bitboard) -> Bitboard:
+    """Squares attacked by queen on given square with given occupancy."""
+    return Bitboard(
+        _ROOK_ATTACKS[index][occupied & ROOK_MASKS[index]] | _BISHOP_ATTACKS[index][occupied & BISHOP_MASKS[index]]
+    )
+
+
+def _between_and_line_tables() -> Tuple[List[List[Bitboard]], List[List[Bitboard]]]:
+    between = [[Bitboard(0)] * 64 for _ in range(64)]
+    line = [[Bitboard(0)] * 64 for _ in range(64)]
+    for a in range(64):
+        for rays, directions in ((ROOK_RAYS, ROOK_DIRECTIONS), (BISHOP_RAYS, BISHOP_DIRECTIONS)):
+            for df, dr in directions:
+                f, r = (a & 7) + df, (a >> 3) + dr
+                squares = 0
+                while 0 <= f < 8 and 0 <= r < 8:
+                    b = f | (r << 3)
+                    between[a][b] = Bitboard(squares)
+                    line[a][b] = Bitboard((rays[a] & rays[b]) | (1 << a) | (1 << b))
+                    squares |= 1 << b
+                    f, r = f + df, r + dr
+    return between, line
+
+
+# BETWEEN: squares strictly between two squares on common rank, file or diagonal (empty if squares are not aligned)
+# LINE: whole rank, file or diagonal going through two squares (empty if squares are not aligned)
+BETWEEN, LINE = _between_and_line_tables()
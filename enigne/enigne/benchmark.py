@@ -0,0 +1,176 @@
+"""Micro-benchmarks of hot paths of the engine over a fixed corpus of positions."""
+import statistics
+import time
+from typing import Callable, Dict, List, Tuple, Any, Optional, Iterable
+
+from .board import Board, Square
+from .eval import evaluate_material
+from .move_gen import move_gen, legal_move_gen, is_attacked
+from .search import alphabeta_search
+
+
+BENCHMARK_FENS = [
+    # Initial position
+    'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+    # Kiwipete
+    'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+    # Rook endgame with en passant tricks
+    '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+    # Promotions and castling
+    'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+    'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+    # Quiet middle game
+    'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+]
+
+SEARCH_DEPTH = 2
+
+# Benchmark setup takes list of FENs and returns function running one round and number of operations in the round
+Benchmark = Callable[[List[str]], Tuple[Callable[[], Any], int]]
+
+
+def _bench_load_fen(fens: List[str]) -> Tuple[Callable[[], Any], int]:
+    board = Board()
+
+    def run():
+        for fen in fens:
+            board.load_fen(fen)
+    return run, len(fens)
+
+
+def _bench_fen(fens: List[str]) -> Tuple[Callable[[], Any], int]:
+    boards = [Board(fen) for fen in fens]
+
+    def run():
+        for board in boards:
+            board.fen()
+    return run, len(boards)
+
+
+def _bench_move_undo(fens: List[str]) -> Tuple[Callable[[], Any], int]:
+    positions = [(board, list(legal_move_gen(board))) for board in map(Board, fens)]
+
+    def run():
+        for board, moves in positions:
+            for move in moves:
+                board.undo_move(board.move(move))
+    return run, sum(len(moves) for _, moves in positions)
+
+
+def _bench_move_gen(fens: List[str]) -> Tuple[Callable[[], Any], int]:
+    boards = [Board(fen) for fen in fens]
+
+    def run():
+        for board in boards:
+            for _ in move_gen(board):
+                pass
+    return run, len(boards)
+
+
+def _bench_legal_move_gen(fens: List[str]) -> Tuple[Callable[[], Any], int]:
+    boards = [Board(fen) for fen in fens]
+
+    def run():
+        for board in boards:
+            for _ in legal_move_gen(board):
+                pass
+    return run, len(boards)
+
+
+def _bench_is_attacked(fens: List[str]) -> Tuple[Callable[[], Any], int]:
+    boards = [Board(fen) for fen in fens]
+    squares = [Square.from_index(index) for index in range(64)]
+
+    def run():
+        for board in boards:
+            for color in (Board.WHITE, Board.BLACK):
+                for square in squares:
+                    is_attacked(board, square, color)
+    return run, len(boards) * 2 * len(squares)
+
+
+def _bench_evaluate_material(fens: List[str]) -> Tuple[Callable[[], Any], int]:
+    boards = [Board(fen) for fen in fens]
+
+    def run():
+        for board in boards:
+            evaluate_material(board)
+    return run, len(boards)
+
+
+def _bench_alphabeta(fens: List[str]) -> Tuple[Callable[[], Any], int]:
+    boards = [Board(fen) for fen in fens]
+
+    def run():
+        for board in boards:
+            alphabeta_search(board, SEARCH_DEPTH)
+    return run, len(boards)
+
+
+BENCHMARKS: Dict[str, Benchmark] = {
+    'load_fen': _bench_load_fen,
+    'fen': _bench_fen,
+    'move_undo': _bench_move_undo,
+    'move_gen': _bench_move_gen,
+    'legal_move_gen': _bench_legal_move_gen,
+    'is_attacked': _bench_is_attacked,
+    'evaluate_material': _bench_evaluate_material,
+    'alphabeta': _bench_alphabeta,
+}
+
+
+def _calibrate(run: Callable[[], Any], min_time: float) -> int:
+    """Finds number of rounds (1, 2, 5, 10, 20, ...) taking at least `min_time` seconds, like `timeit` does."""
+    number = 1
+    while True:
+        for multiplier in (1, 2, 5):
+            rounds = number * multiplier
+            start = time.perf_counter()
+            for _ in range(rounds):
+                run()
+            if time.perf_counter() - start >= min_time:
+                return rounds
+        number *= 10
+
+
+def run_benchmark(name: str, fens: Optional[List[str]] = None, repeat: int = 5, warmup: int = 1,
+                  number: Optional[int] = None, min_time: float = 0.2) -> Dict[str, Any]:
+    """
+    Times benchmark of given name.
+    :param repeat: Number of measured repetitions.
+    :param warmup: Number of unmeasured repetitions run before measuring.
+    :param number: Number of rounds over the corpus in one repetition (calibrated by `min_time` if not given).
+    :return: Statistics of time per operation in seconds.
+    """
+    run, ops = BENCHMARKS[name](BENCHMARK_FENS if fens is None else fens)
+    if number is None:
+        number = _calibrate(run, min_time)
+
+    for _ in range(warmup * number):
+        run()
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            run()
+        times.append((time.perf_counter() - start) / (number * ops))
+
+    median = statistics.median(times)
+    return {
+        'name': name,
+        'ops': ops,
+        'number': number,
+        'repeat': repeat,
+        'min': min(times),
+        'median': median,
+        'mean': statistics.mean(times),
+        'stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+        'ops_per_sec': int(1 / median) if median else 0,
+    }
+
+
+def run_benchmarks(names: Optional[Iterable[str]] = None, **kwargs) -> Iterable[Dict[str, Any]]:
+    """Runs given benchmarks (all by default), see `run_benchmark` for arguments."""
+    for name in (BENCHMARKS if names is None else names):
+        yield run_benchmark(name, **kwargs)
@@ -1,17 +1,54 @@
 from __future__ import annotations
 
+import random
 from contextlib import contextmanager
-from copy import deepcopy
-from typing import NewType, Optional, Dict, Any, Set, Tuple, Iterator
+from functools import reduce
+from operator import xor
+from typing import NewType, Optional, Any, Tuple, Iterator, List, Sequence
 
 Piece = NewType('Piece', int)
 Color = NewType('Color', int)
 File = NewType('File', int)
 Rank = NewType('Rank', int)
 ColoredPiece = Tuple[Piece, Color]
+Bitboard = NewType('Bitboard', int)
+UndoInfo = Tuple[int, int, ColoredPiece, Optional[ColoredPiece], int, int, int, int, int, int, int]
+
+
+def popcount(bitboard: Bitboard) -> int:
+    """Number of set squares in bitboard."""
+    return bin(bitboard).count('1')
+
+
+def iter_bits(bitboard: Bitboard) -> Iterator[int]:
+    """Iterates indexes of set squares in bitboard (from a1 to h8)."""
+    while bitboard:
+        lsb = bitboard & -bitboard
+        yield lsb.bit_length() - 1
+        bitboard ^= lsb
+
+
+# Zobrist keys (generated from fixed seed so they are same in all processes)
+_zobrist_random = random.Random(0x5EED)
+ZOBRIST_PIECES = [[[_zobrist_random.getrandbits(64) for _ in range(64)] for _ in range(7)] for _ in range(2)]
+ZOBRIST_TURN = _zobrist_random.getrandbits(64)
+_ZOBRIST_CASTLING_RIGHTS = [_zobrist_random.getrandbits(64) for _ in range(4)]
+ZOBRIST_CASTLING = [
+    reduce(xor, (key for right, key in enumerate(_ZOBRIST_CASTLING_RIGHTS) if castling & (1 << right)), 0)
+    for castling in range(16)
+]
+_ZOBRIST_ENPASSANT_FILES = [_zobrist_random.getrandbits(64) for _ in range(8)]
+# Indexed by enpassant square, last item (index -1) stands for no enpassant square
+ZOBRIST_ENPASSANT = [_ZOBRIST_ENPASSANT_FILES[index & 7] for index in range(64)] + [0]
 
 
 class Square:
+    """
+    Square of the board. Squares on the board are interned in `SQUARES` (indexed by `index`), use `from_index`
+    or `from_str` to get them without allocation.
+    """
+    __slots__ = ('_file', '_rank')
+
     _file: File
     _rank: Rank
 
@@ -22,24 +59,25 @@ class Square:
     def file(self) -> File:
         return self._file
 
-    @file.setter
-    def file(self, val):
-        self._file = val
-
     @property
     def rank(self) -> Rank:
         return self._rank
 
-    @rank.setter
-    def rank(self, val):
-        self._rank = val
-
     @classmethod
     def from_str(cls, square_str: str) -> Square:
         file_str, rank_str = square_str
         file = File(ord(file_str) - ord('a'))
         rank = Rank(int(rank_str) - 1)
-        return cls(file, rank)
+        return SQUARES[file | (rank << 3)]
+
+    @property
+    def index(self) -> int:
+        """Index of square in bitboard (a1 = 0, b1 = 1, ..., h8 = 63)."""
+        return self._file | (self._rank << 3)
+
+    @classmethod
+    def from_index(cls, index: int) -> Square:
+        return SQUARES[index]
 
     def is_valid(self) -> bool:
         return 0 <= self.file < 8 and 0 <= self.rank < 8
@@ -57,33 +95,57 @@ class Square:
         return self._file | (self._rank << 3)
 
     def __add__(self, other: Tuple[int, int]) -> Square:
-        return Square(File(int(self.file) + other[0]), Rank(int(self.rank) + other[1]))
+        file, rank = self._file + other[0], self._rank + other[1]
+        if 0 <= file < 8 and 0 <= rank < 8:
+            return SQUARES[file | (rank << 3)]
+        return Square(File(file), Rank(rank))
+
+
+SQUARES = [Square(File(index & 7), Rank(index >> 3)) for index in range(64)]
+
+
+def encode_move(start: int, end: int, promote: int = 0) -> int:
+    """Packs move to 16-bit integer (see `Move`)."""
+    return start | (end << 6) | (promote << 12)
 
 
 class Move:
-    _start: Square
-    _end: Square
-    _promote: Piece
+    """
+    Move is a thin view of 16-bit move code. Bits 0-5 holds index of start square, bits 6-11 index of end square
+    and bits 12-15 promotion piece (`Board.EMPTY` if move is not a promotion). Move generator, board and search
+    work with codes directly, `Move` objects are created only at API boundaries.
+    """
+    __slots__ = ('_code', )
+
+    _code: int
 
     @property
     def start(self) -> Square:
-        return self._start
+        return SQUARES[self._code & 63]
 
     @property
     def end(self) -> Square:
-        return self._end
+        return SQUARES[(self._code >> 6) & 63]
 
     @property
     def promote(self) -> Optional[Piece]:
-        return self._promote
+        return Piece(self._code >> 12) or None
+
+    @property
+    def code(self) -> int:
+        return self._code
 
     def __hash__(self):
-        return hash(self.start) | hash(self.end) << 6 | int(self.promote if self.promote is not None else 0) << 12
+        return self._code
 
     def __init__(self, start: Square, end: Square, promote: Optional[Piece] = None):
-        self._start = start
-        self._end = end
-        self._promote = promote
+        self._code = encode_move(start.index, end.index, promote or 0)
+
+    @classmethod
+    def from_code(cls, code: int) -> Move:
+        move = cls.__new__(cls)
+        move._code = code
+        return move
 
     @classmethod
     def from_str(cls, move_str: str) -> Move:
@@ -91,7 +153,7 @@ class Move:
         return cls(Square.from_str(start), Square.from_str(end), Board.char_to_piece(promote) if promote else None)
 
     def __eq__(self, other):
-        return self.start == other.start and self.end == other.end and self.promote == other.promote
+        return isinstance(other, Move) and self._code == other._code
 
     def __repr__(self):
         return f'{self.__class__.__name__}({repr(self.start)}, {repr(self.end)}, {repr(self.promote)})'
@@ -102,18 +164,40 @@ class Move:
 
 
 class Board:
-    """Represents chess board"""
+    """
+    Represents chess board
+
+    Pieces are stored in bitboards (one 64-bit integer per piece type and color) together with occupancy masks of
+    both colors. Mailbox `_squares` mirrors bitboards for constant time lookup of piece on given square.
+    """
 
-    _pieces: Dict[Any, Any]
+    _squares: List[Optional[ColoredPiece]]
+    _bitboards: List[List[Bitboard]]
+    _occupancy: List[Bitboard]
     _turn: Color
-    _castling: Set[str]
-    _enpassant: Optional[Square]
+    _castling: int
+    _enpassant: int
     _halfmove: int
     _fullmove: int
+    _undo_stack: List[Optional[UndoInfo]]
+    _ply: int
+    _hash: int
 
     EMPTY, PAWN, BISHOP, KNIGHT, ROOK, QUEEN, KING = [Piece(p) for p in range(7)]
     WHITE, BLACK = Color(0), Color(1)
 
+    # Castling rights bits indexed by color
+    KING_CASTLING = (1, 4)
+    QUEEN_CASTLING = (2, 8)
+
+    # Castling rights kept after move from or to given square
+    _CASTLING_MASKS = [
+        {0: ~2, 4: ~3, 7: ~1, 56: ~8, 60: ~12, 63: ~4}.get(index, ~0) & 15 for index in range(64)
+    ]
+
+    # Initial size of undo stack, it grows when exceeded
+    MAX_PLY = 256
+
     @classmethod
     def char_to_piece(cls, piece_char: str) -> Piece:
         return {
@@ -140,7 +224,7 @@ class Board:
                     self[Square(File(file), Rank(7 - irank))] = piece, piece_color
                     file += 1
 
-        self._turn = self.WHITE if side == 'w' else self.BLACK
+        self.turn = self.WHITE if side == 'w' else self.BLACK
 
         self.clear_castling()
         if 'K' in castling:
@@ -165,13 +249,14 @@ class Board:
             ss = []
             empty = 0
             for file in range(8):
-                if (7 - irank, file) not in self:
+                colored_piece = self._squares[((7 - irank) << 3) | file]
+                if colored_piece is None:
                     empty += 1
                 else:
                     if empty:
                         ss.append(str(empty))
                         empty = 0
-                    ss.append(self.piece_to_char(*self[Square(File(file), Rank(7 - irank))]))
+                    ss.append(self.piece_to_char(*colored_piece))
             if empty:
                 ss.append(str(empty))
 
@@ -181,7 +266,7 @@ class Board:
             '/'.join(s),
             'w' if self._turn == self.WHITE else 'b',
             self._castling_to_str(),
-            str(self._enpassant) if self._enpassant else '-',
+            str(self.enpassant) if self.enpassant else '-',
             repr(self._halfmove),
             repr(self._fullmove),
         ])
@@ -190,10 +275,15 @@ class Board:
         return self.fen()
 
     def __init__(self, fen: Optional[str] = None):
-        self._pieces = {}
-        self._castling = set()
-        self._enpassant_obj = Square(File(0), Rank(0))
-        self._enpassant = None
+        self._squares = [None] * 64
+        self._bitboards = [[Bitboard(0)] * 7 for _ in (self.WHITE, self.BLACK)]
+        self._occupancy = [Bitboard(0), Bitboard(0)]
+        self._castling = 0
+        self._enpassant = -1
+        self._turn = self.WHITE
+        self._hash = 0
+        self._undo_stack = [None] * self.MAX_PLY
+        self._ply = 0
         if fen is not None:
             self.load_fen(fen)
         else:
@@ -205,66 +295,115 @@ class Board:
 
     @turn.setter
     def turn(self, value: Color) -> None:
+        if value != self._turn:
+            self._hash ^= ZOBRIST_TURN
         self._turn = value
 
+    @property
+    def zobrist_hash(self) -> int:
+        """64-bit Zobrist hash of position (pieces, side to move, castling rights and enpassant file)."""
+        return self._hash
+
+    @property
+    def ply(self) -> int:
+        """Number of moves (including null moves) on the undo stack."""
+        return self._ply
+
     @property
     def opponent(self) -> Color:
         return self.WHITE if self.turn == self.BLACK else self.BLACK
 
     @property
     def enpassant(self) -> Optional[Square]:
-        return self._enpassant
+        return Square.from_index(self._enpassant) if self._enpassant >= 0 else None
 
     @property
     def own_king_square(self) -> Square:
-        return next(square for square, piece in self.iter_own_pieces() if piece == Board.KING)
+        return Square.from_index(self.king_index(self.turn))
 
     @property
     def opponent_king_square(self) -> Square:
-        return next(square for square, piece in self.iter_opponent_pieces() if piece == Board.KING)
+        return Square.from_index(self.king_index(self.opponent))
+
+    def piece_at(self, index: int) -> Optional[ColoredPiece]:
+        """Piece and its color on square of given index (`None` if empty)."""
+        return self._squares[index]
+
+    def king_index(self, color: Color) -> int:
+        """Index of square of king of given color."""
+        return self._bitboards[color][self.KING].bit_length() - 1
+
+    @property
+    def occupied(self) -> Bitboard:
+        """Bitboard of all occupied squares."""
+        return Bitboard(self._occupancy[self.WHITE] | self._occupancy[self.BLACK])
+
+    def occupancy(self, color: Color) -> Bitboard:
+        """Bitboard of squares occupied by pieces of given color."""
+        return self._occupancy[color]
+
+    def bitboard(self, piece: Piece, color: Color) -> Bitboard:
+        """Bitboard of squares occupied by given piece of given color."""
+        return self._bitboards[color][piece]
+
+    def piece_bitboards(self, color: Color) -> Sequence[Bitboard]:
+        """Bitboards of pieces of given color indexed by piece (read only, it is not copied)."""
+        return self._bitboards[color]
 
     def rel_rank(self, rank: Rank) -> Rank:
         """Rank from point of the view of side to turn"""
         return Rank(7 - int(rank)) if self.turn == Board.BLACK else rank
 
     def clear(self) -> None:
-        self._pieces.clear()
+        self._squares[:] = [None] * 64
+        for bitboards in self._bitboards:
+            bitboards[:] = [Bitboard(0)] * 7
+        self._occupancy[:] = [Bitboard(0), Bitboard(0)]
         self._turn = self.WHITE
-        self.clear_castling()
-        self.clear_enpassant()
+        self._castling = 0
+        self._enpassant = -1
+        self._hash = 0
         self._halfmove = 0
         self._fullmove = 1
+        self._ply = 0
+
+    def _set_enpassant(self, index: int) -> None:
+        self._hash ^= ZOBRIST_ENPASSANT[self._enpassant] ^ ZOBRIST_ENPASSANT[index]
+        self._enpassant = index
+
+    def _set_castling(self, castling: int) -> None:
+        self._hash ^= ZOBRIST_CASTLING[self._castling] ^ ZOBRIST_CASTLING[castling]
+        self._castling = castling
 
     def set_enpassant(self, file: File, color: Color) -> None:
-        self._enpassant_obj.file, self._enpassant_obj.rank = file, Rank(2 if color == self.WHITE else 5)
-        self._enpassant = self._enpassant_obj
+        self._set_enpassant(file | ((2 if color == self.WHITE else 5) << 3))
 
     def clear_enpassant(self) -> None:
-        self._enpassant = None
+        self._set_enpassant(-1)
 
     def clear_castling(self) -> None:
-        self._castling.clear()
+        self._set_castling(0)
 
     def has_any_castling(self) -> bool:
         return bool(self._castling)
 
     def has_queen_castling(self, color: Color) -> bool:
-        return ('Q' if color == self.WHITE else 'q') in self._castling
+        return bool(self._castling & self.QUEEN_CASTLING[color])
 
     def has_king_castling(self, color: Color) -> bool:
-        return ('K' if color == self.WHITE else 'k') in self._castling
+        return bool(self._castling & self.KING_CASTLING[color])
 
     def set_queen_castling(self, color: Color) -> None:
-        self._castling.add('Q' if color == self.WHITE else 'q')
+        self._set_castling(self._castling | self.QUEEN_CASTLING[color])
 
     def set_king_castling(self, color: Color) -> None:
-        self._castling.add('K' if color == self.WHITE else 'k')
+        self._set_castling(self._castling | self.KING_CASTLING[color])
 
     def unset_queen_castling(self, color: Color) -> None:
-        self._castling.discard('Q' if color == self.WHITE else 'q')
+        self._set_castling(self._castling & ~self.QUEEN_CASTLING[color])
 
     def unset_king_castling(self, color: Color) -> None:
-        self._castling.discard('K' if color == self.WHITE else 'k')
+        self._set_castling(self._castling & ~self.KING_CASTLING[color])
 
     def _castling_to_str(self) -> str:
         if not self.has_any_castling():
@@ -278,10 +417,10 @@ class Board:
             ])
 
     def iter_pieces(self, color: Color) -> Iterator[Tuple[Square, Piece]]:
+        squares = self._squares
         yield from (
-            (Square(File(file), Rank(rank)), pc)
-            for (rank, file), (pc, cl) in list(self._pieces.items())
-            if cl == color
+            (Square.from_index(index), squares[index][0])
+            for index in list(iter_bits(self._occupancy[color]))
         )
 
     def iter_own_pieces(self):
@@ -296,86 +435,138 @@ class Board:
         :param move:
         :return: Data needed for undoing move.
         """
-
-        undo_info = \
-            self._turn, self._halfmove, self._fullmove, deepcopy(self._enpassant), \
-            self._pieces.copy(), self._castling.copy()
-
-        piece, color = self[move.start]
-        captured_piece, _ = self[move.end] or (None, None)
-
-        # Half move counter
-        if piece == self.PAWN or self[move.end] is not None:
+        self.push(move)
+        return self._undo_stack[self._ply - 1]
+
+    def push(self, move: Move) -> None:
+        """Makes move and records changes needed for undoing it on the undo stack."""
+        self.push_code(move.code)
+
+    def push_code(self, code: int) -> None:
+        """Same as `push` but takes packed move code (see `Move`)."""
+        start, end = code & 63, (code >> 6) & 63
+        squares = self._squares
+        colored_piece = squares[start]
+        piece, color = colored_piece
+        captured = squares[end]
+        captured_index = end
+        rook_start = rook_end = -1
+        castling, enpassant, halfmove, fullmove = self._castling, self._enpassant, self._halfmove, self._fullmove
+
+        # Half move counter and enpassant capture
+        if piece == self.PAWN:
+            self._halfmove = 0
+            if end == enpassant:
+                captured_index = end - 8 if color == self.WHITE else end + 8
+                captured = squares[captured_index]
+        elif captured is not None:
             self._halfmove = 0
         else:
             self._halfmove += 1
 
         # Full move counter
-        if self.turn == self.BLACK:
+        if color == self.BLACK:
             self._fullmove += 1
 
-        self[move.end], self[move.start] = ((move.promote, self.turn) if move.promote else self[move.start]), None
-
-        # Enpassant capture
-        if self._enpassant and piece == self.PAWN and move.end.file == self._enpassant.file:
-            if move.end.rank == self.rel_rank(Rank(5)):
-                self[Square(move.end.file, self.rel_rank(Rank(4)))] = None
-
-        # Enpassant square
-        if piece == self.PAWN and abs(move.start.rank - move.end.rank) == 2:
-            self.set_enpassant(move.start.file, self.turn)
-        else:
-            self.clear_enpassant()
+        if captured is not None:
+            self._remove(captured_index)
+        self._remove(start)
+        self._put(end, (code >> 12) or piece, color)
 
         # Castling
-        if piece == self.KING and abs(move.start.file - move.end.file) == 2:
-            if move.end.file == File(6):
-                start = Square(File(7), move.end.rank)
-                end = Square(File(5), move.end.rank)
-            else:
-                start = Square(File(0), move.end.rank)
-                end = Square(File(3), move.end.rank)
+        if piece == self.KING and abs(end - start) == 2:
+            rook_start, rook_end = (end + 1, end - 1) if end > start else (end - 2, end + 1)
+            self._remove(rook_start)
+            self._put(rook_end, self.ROOK, color)
 
-            self[end], self[start] = self[start], None
+        # Enpassant square
+        self._enpassant = (start + end) >> 1 if piece == self.PAWN and abs(end - start) == 16 else -1
 
         # Castling flags
-        if piece == self.KING:
-            self.unset_king_castling(self.turn)
-            self.unset_queen_castling(self.turn)
-        if piece == self.ROOK and move.start.rank == self.rel_rank(Rank(0)):
-            if move.start.file == File(0):
-                self.unset_queen_castling(self.turn)
-            elif move.start.file == File(7):
-                self.unset_king_castling(self.turn)
-        if captured_piece == self.ROOK and move.end.rank == self.rel_rank(Rank(7)):
-            if move.end.file == File(0):
-                self.unset_queen_castling(self.opponent)
-            elif move.end.file == File(7):
-                self.unset_king_castling(self.opponent)
+        self._castling &= self._CASTLING_MASKS[start] & self._CASTLING_MASKS[end]
 
         # Change side
         self._turn = self.opponent
 
-        return undo_info
+        self._hash ^= \
+            ZOBRIST_TURN ^ ZOBRIST_ENPASSANT[enpassant] ^ ZOBRIST_ENPASSANT[self._enpassant] \
+            ^ ZOBRIST_CASTLING[castling] ^ ZOBRIST_CASTLING[self._castling]
+
+        undo_info = \
+            start, end, colored_piece, captured, captured_index, rook_start, rook_end, \
+            castling, enpassant, halfmove, fullmove
+        if self._ply < len(self._undo_stack):
+            self._undo_stack[self._ply] = undo_info
+        else:
+            self._undo_stack.append(undo_info)
+        self._ply += 1
+
+    def push_null(self) -> None:
+        """Passes the turn to the opponent without moving (null move), it has to be undone by `pop_null`."""
+        undo_info = self._enpassant, self._halfmove, self._fullmove
+        self._hash ^= ZOBRIST_TURN ^ ZOBRIST_ENPASSANT[self._enpassant]
+        self._enpassant = -1
+        self._halfmove += 1
+        if self._turn == self.BLACK:
+            self._fullmove += 1
+        self._turn = self.opponent
+        if self._ply < len(self._undo_stack):
+            self._undo_stack[self._ply] = undo_info
+        else:
+            self._undo_stack.append(undo_info)
+        self._ply += 1
+
+    def pop_null(self) -> None:
+        """Undoes null move made by `push_null`."""
+        self._ply -= 1
+        self._enpassant, self._halfmove, self._fullmove = self._undo_stack[self._ply]
+        self._hash ^= ZOBRIST_TURN ^ ZOBRIST_ENPASSANT[self._enpassant]
+        self._turn = self.opponent
+
+    def pop(self) -> None:
+        """Undoes last move made by `push` (or `move`)."""
+        self._ply -= 1
+        self._unmake(self._undo_stack[self._ply])
+
+    def unwind(self, ply: int) -> None:
+        """Undoes moves and null moves until given number of them is left on the undo stack."""
+        while self._ply > ply:
+            if len(self._undo_stack[self._ply - 1]) == 3:
+                self.pop_null()
+            else:
+                self.pop()
 
     @contextmanager
     def do_move(self, move: Move) -> None:
-        undo_info = self.move(move)
+        self.push(move)
         try:
             yield
         finally:
-            self.undo_move(undo_info)
+            self.pop()
 
     def undo_move(self, undo_info: Any) -> None:
-        self._turn, self._halfmove, self._fullmove = undo_info[:3]
-        if undo_info[3] is not None:
-            self.set_enpassant(undo_info[3].file, self.opponent)
-        else:
-            self.clear_enpassant()
-        self._pieces.clear()
-        self._pieces.update(undo_info[4])
-        self._castling.clear()
-        self._castling.update(undo_info[5])
+        self._ply -= 1
+        self._unmake(undo_info)
+
+    def _unmake(self, undo_info: UndoInfo) -> None:
+        start, end, colored_piece, captured, captured_index, rook_start, rook_end, \
+            castling, enpassant, self._halfmove, self._fullmove = undo_info
+        piece, color = colored_piece
+
+        self._hash ^= \
+            ZOBRIST_TURN ^ ZOBRIST_ENPASSANT[enpassant] ^ ZOBRIST_ENPASSANT[self._enpassant] \
+            ^ ZOBRIST_CASTLING[castling] ^ ZOBRIST_CASTLING[self._castling]
+        self._castling, self._enpassant = castling, enpassant
+
+        self._remove(end)
+        self._put(start, piece, color)
+        if captured is not None:
+            self._put(captured_index, *captured)
+        if rook_start >= 0:
+            self._remove(rook_end)
+            self._put(rook_start, self.ROOK, color)
+
+        self._turn = color
 
     def pieces(self, square: Square, filter_color: Color, filter_piece: Optional[Piece] = None) -> Optional[Piece]:
         colored_piece = self[square]
@@ -393,20 +584,39 @@ class Board:
     def own_pieces(self, square: Square, filter_piece: Optional[Piece] = None) -> Optional[Piece]:
         return self.pieces(square, self.turn, filter_piece)
 
+    def _put(self, index: int, piece: Piece, color: Color) -> None:
+        mask = 1 << index
+        self._squares[index] = piece, color
+        self._bitboards[color][piece] |= mask
+        self._occupancy[color] |= mask
+        self._hash ^= ZOBRIST_PIECES[color][piece][index]
+
+    def _remove(self, index: int) -> None:
+        colored_piece = self._squares[index]
+        if colored_piece is not None:
+            piece, color = colored_piece
+            mask = ~(1 << index)
+            self._squares[index] = None
+            self._bitboards[color][piece] &= mask
+            self._occupancy[color] &= mask
+            self._hash ^= ZOBRIST_PIECES[color][piece][index]
+
     def __setitem__(self, key: Square, value: Optional[ColoredPiece]) -> None:
-        if value is None:
-            if (key.rank, key.file) in self._pieces:
-                del self._pieces[key.rank, key.file]
-        else:
+        index = key.index
+        self._remove(index)
+        if value is not None:
             piece, color = value
-            self._pieces[key.rank, key.file] = (piece, color)
+            self._put(index, piece, color)
 
     def __getitem__(self, key: Square) -> Optional[ColoredPiece]:
-        return self._pieces.get((key.rank, key.file), None)
+        file, rank = key.file, key.rank
+        if 0 <= file < 8 and 0 <= rank < 8:
+            return self._squares[file | (rank << 3)]
+        else:
+            return None
 
     def __contains__(self, key: Square) -> bool:
-        rank, file = key
-        return (rank, file) in self._pieces
+        return self[key] is not None
 
     def __str__(self) -> str:
         s = ["\n+-" + "--+-" * 7 + "--+\n"]
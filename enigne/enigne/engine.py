@@ -2,27 +2,47 @@ from __future__ import annotations
 
 import threading
 from abc import ABC, abstractmethod
-from typing import Optional, Dict, Iterable, Union
+from typing import Optional, Dict, Iterable, Union, List
 
 import enigne
 from .board import Move, Board
-from .search import SearchVisitor, alphabeta_search, BagOfSearchVisitors, PVSearchVisitor, TimeoutHaltSearchVisitor, \
-    NodesCountHaltSearchVisitor, FilterMovesSearchVisitor
+from .search import SearchVisitor, SearchHooks, iterative_deepening_search, SearchOptions, DEFAULT_SEARCH_OPTIONS, \
+    SearchContext, BagOfSearchHooks, FilterMovesSearchHooks, search_hooks
+from .lazy_smp import LazySMP
+from .transposition import TranspositionTable
 
 
 class EngineBase(ABC):
-    _search_visitor: Optional[SearchVisitor]
+    _search_visitor: Union[SearchVisitor, SearchHooks, None]
 
     def __init__(self):
         self._search_visitor = None
 
-    def set_search_visitor(self, _search_visitor: SearchVisitor):
+    def set_search_visitor(self, _search_visitor: Union[SearchVisitor, SearchHooks]):
         self._search_visitor = _search_visitor
 
     @abstractmethod
     def info(self) -> Dict[str, str]:
         pass
 
+    def options(self) -> Dict[str, str]:
+        """UCI options of the engine, names mapped to definitions (e.g. `type spin default 1 min 1 max 64`)."""
+        return {}
+
+    def set_option(self, name: str, value: Optional[str] = None) -> None:
+        """Sets UCI option, unknown options are ignored."""
+        pass
+
+    @property
+    def helper_nodes(self) -> int:
+        """Nodes searched by parallel helpers (not reported by search visitors) in the current search."""
+        return 0
+
+    @property
+    def search_context(self) -> Optional[SearchContext]:
+        """Node counter and halting conditions of the current (or the last) search."""
+        return None
+
     @property
     @abstractmethod
     def search_done(self) -> Optional[Move]:
@@ -81,31 +101,36 @@ class EngineBase(ABC):
         pass
 
 
-class EngineHaltSearchVisitor(SearchVisitor):
-    _engine: EngineBase
-    _child: EngineHaltSearchVisitor
-
-    def __init__(self, engine: EngineBase, parent: Optional[SearchVisitor] = None):
-        super().__init__(parent=parent)
-        self._engine = engine
-
-    def _create_child(self) -> EngineHaltSearchVisitor:
-        return EngineHaltSearchVisitor(self._engine, parent=self)
-
-    @property
-    def halt(self) -> bool:
-        return self._engine.is_search_terminating
-
-
 class Engine(EngineBase):
+    MAX_THREADS = 64
+
     _board: Optional[Board]
     _search_thread: Optional[threading.Thread]
     _terminate_search: bool
     _search_done: Optional[Move]
-
-    def __init__(self):
+    _search_context: Optional[SearchContext]
+    _pv: List[Move]
+    _hash_mb: float
+    _transposition_table: Optional[TranspositionTable]
+    _search_options: SearchOptions
+    _threads: int
+    _lazy_smp: Optional[LazySMP]
+
+    def __init__(self, hash_mb: float = 16, search_options: SearchOptions = DEFAULT_SEARCH_OPTIONS, threads: int = 1):
+        """
+        :param hash_mb: Size of transposition table in MB (0 disables it unless more threads are used).
+        :param search_options: Switches of selective search techniques.
+        :param threads: Number of searching processes, all but one are Lazy SMP helpers (see `LazySMP`).
+        """
         super().__init__()
         self._board = None
+        self._hash_mb = hash_mb
+        self._transposition_table = TranspositionTable(hash_mb) if hash_mb else None
+        self._search_options = search_options
+        self._lazy_smp = None
+        self.threads = threads
+        self._search_context = None
+        self._pv = []
         self._search_thread = None
         self._terminate_search = False
         self._search_done = None
@@ -116,6 +141,54 @@ class Engine(EngineBase):
             'name': f'{enigne.__name__} {enigne.__version__}',
         }
 
+    def options(self) -> Dict[str, str]:
+        return {'Threads': f'type spin default 1 min 1 max {self.MAX_THREADS}'}
+
+    def set_option(self, name: str, value: Optional[str] = None) -> None:
+        if name == 'Threads':
+            try:
+                self.threads = int(value)
+            except (TypeError, ValueError):
+                # Invalid value, current number of threads is kept
+                pass
+
+    @property
+    def threads(self) -> int:
+        return self._threads
+
+    @threads.setter
+    def threads(self, threads: int) -> None:
+        self._threads = max(1, min(threads, self.MAX_THREADS))
+        if self._lazy_smp is not None and self._lazy_smp.helpers != self._threads - 1:
+            self._lazy_smp.close()
+            self._lazy_smp = None
+
+    @property
+    def helper_nodes(self) -> int:
+        return self._lazy_smp.nodes if self._lazy_smp is not None else 0
+
+    @property
+    def search_context(self) -> Optional[SearchContext]:
+        return self._search_context
+
+    @property
+    def pv(self) -> List[Move]:
+        """Principal variation of the last search."""
+        return self._pv
+
+    def _get_lazy_smp(self) -> Optional[LazySMP]:
+        if self._threads <= 1:
+            return None
+        if self._lazy_smp is not None and not self._lazy_smp.alive:
+            # Some helper died, pool is replaced
+            self._lazy_smp.close()
+            self._lazy_smp = None
+        if self._lazy_smp is None:
+            if self._transposition_table is None or self._transposition_table.name is None:
+                self._transposition_table = TranspositionTable(self._hash_mb or 16, shared=True)
+            self._lazy_smp = LazySMP(self._threads - 1, self._transposition_table)
+        return self._lazy_smp
+
     @property
     def search_done(self) -> Optional[Move]:
         return self._search_done
@@ -125,7 +198,8 @@ class Engine(EngineBase):
         return not self._search_done and self._search_thread
 
     def new_game(self) -> None:
-        pass
+        if self._transposition_table is not None:
+            self._transposition_table.clear()
 
     def modify_position(self, fen: Optional[str] = None, moves: Optional[Iterable[Move]] = None) -> None:
         if fen:
@@ -138,27 +212,43 @@ class Engine(EngineBase):
                filter_moves: Optional[Iterable[Move]] = None, timeout: Optional[float] = None,
                blocking: bool = True) -> Union[None, Move]:
 
+        context = SearchContext(timeout=timeout or None, nodes_limit=nodes or None)
+        self._search_context = context
+
         def do_search():
             try:
-                visitors = {
-                    'halt': EngineHaltSearchVisitor(self),
-                    'pv': PVSearchVisitor()
-                }
-                if timeout:
-                    visitors['timeout_halt'] = TimeoutHaltSearchVisitor(timeout)
-                if nodes:
-                    visitors['nodes_halt'] = NodesCountHaltSearchVisitor(nodes)
+                hooks = []
                 if filter_moves:
-                    visitors['filter_moves'] = FilterMovesSearchVisitor(list(filter_moves))
+                    hooks.append(FilterMovesSearchHooks(list(filter_moves)))
                 if self._search_visitor:
-                    visitors['custom'] = self._search_visitor
-
-                visitor = BagOfSearchVisitors(visitors)
-
-                alphabeta_search(self._board, depth, visitor=visitor)
-
-                self._search_done = visitors['pv'].best_move
-                return visitors['pv'].best_move
+                    hooks.append(search_hooks(self._search_visitor))
+
+                completed_depth = 0
+
+                def on_iteration(iteration_depth: int, *_) -> None:
+                    nonlocal completed_depth
+                    completed_depth = iteration_depth
+
+                lazy_smp = self._get_lazy_smp()
+                if lazy_smp is not None:
+                    lazy_smp.start(self._board, depth, filter_moves, self._search_options)
+                try:
+                    _, best_move, pv = iterative_deepening_search(
+                        self._board, depth, visitor=BagOfSearchHooks(hooks),
+                        transposition_table=self._transposition_table, options=self._search_options,
+                        on_iteration=on_iteration, context=context
+                    )
+                finally:
+                    helper_result = lazy_smp.stop() if lazy_smp is not None else None
+
+                # Helper could complete deeper iteration than the main search
+                if helper_result is not None and helper_result[0] > completed_depth:
+                    best_move = Move.from_code(helper_result[2])
+                    pv = [Move.from_code(code) for code in helper_result[3]]
+
+                self._pv = pv
+                self._search_done = best_move
+                return best_move
             except:
                 self._search_done = 'ERROR'
                 raise
@@ -180,6 +270,8 @@ class Engine(EngineBase):
 
     def terminate_search(self):
         self._terminate_search = True
+        if self._search_context is not None:
+            self._search_context.stop()
 
     @property
     def is_search_terminating(self) -> bool:
@@ -189,3 +281,8 @@ class Engine(EngineBase):
         if self._search_thread:
             self.terminate_search()
             self._search_thread.join()
+        if self._lazy_smp is not None:
+            self._lazy_smp.close()
+            self._lazy_smp = None
+        if self._transposition_table is not None:
+            self._transposition_table.close()
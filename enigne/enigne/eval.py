@@ -1,4 +1,4 @@
-from .board import Board
+from .board import Board, popcount
 
 
 MATERIAL_SCORES = {
@@ -12,5 +12,7 @@ MATERIAL_SCORES = {
 
 
 def evaluate_material(board: Board) -> float:
-    return sum(MATERIAL_SCORES[piece] for _, piece in board.iter_own_pieces()) \
-                - sum(MATERIAL_SCORES[piece] for _, piece in board.iter_opponent_pieces())
+    return sum(
+        score * (popcount(board.bitboard(piece, board.turn)) - popcount(board.bitboard(piece, board.opponent)))
+        for piece, score in MATERIAL_SCORES.items()
+    )
@@ -0,0 +1,174 @@
+"""
+Lazy SMP: helper processes search the same root as the main search (each starting with different depth) and share
+transposition table with it, so they fill the table with results which the main search reuses.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import queue
+import time
+from typing import Optional, List, Tuple, Container, Any
+
+from .board import Board, Move
+from .search import SearchHooks, SearchContext, SearchOptions, iterative_deepening_search, DEFAULT_SEARCH_OPTIONS
+from .transposition import TranspositionTable
+
+# Helpers publish node count and check stop flag every this number of nodes
+PUBLISH_NODES = 256
+
+# Depth, score, best move code and principal variation codes of completed iteration
+HelperResult = Tuple[int, float, int, List[int]]
+
+
+class _HelperSearchHooks(SearchHooks):
+    """Hooks of helper search restricting root moves."""
+    _filter_moves: Optional[Container[Move]]
+
+    def __init__(self, filter_moves: Optional[Container[Move]]):
+        self._filter_moves = filter_moves
+
+    def skip_root(self, move: Move) -> bool:
+        return self._filter_moves is not None and move not in self._filter_moves
+
+
+def _helper_main(index: int, transposition_table: TranspositionTable, stop: Any, nodes: Any,
+                 tasks: multiprocessing.Queue, results: multiprocessing.Queue) -> None:
+    """Main loop of helper process: runs searches from task queue until `None` is received."""
+    for task in iter(tasks.get, None):
+        fen, depth, start_depth, filter_codes, options = task
+        filter_moves = {Move.from_code(code) for code in filter_codes} if filter_codes is not None else None
+        hooks = _HelperSearchHooks(filter_moves)
+
+        def on_poll(context: SearchContext) -> bool:
+            # Publishes node count and halts on shared stop flag
+            nodes[index] = context.nodes
+            return stop.value
+
+        def on_iteration(iteration_depth: int, score: float, best_move: Move, pv: List[Move]) -> None:
+            results.put((index, (iteration_depth, score, best_move.code, [move.code for move in pv])))
+
+        context = SearchContext(poll_nodes=PUBLISH_NODES, on_poll=on_poll)
+        try:
+            iterative_deepening_search(Board(fen), depth, hooks, transposition_table, options, start_depth,
+                                       on_iteration, context)
+        finally:
+            nodes[index] = context.nodes
+            results.put((index, None))
+
+
+class LazySMP:
+    """
+    Pool of helper processes for Lazy SMP search. Helpers are started once and wait for searches, odd helpers
+    start iterative deepening one ply deeper than the main search. Helpers are spawned (not forked) as they are
+    usually started from search thread of multithreaded process.
+    """
+    # Seconds to wait for stopped helpers before they are terminated
+    STOP_TIMEOUT = 5.0
+    # Interval of checking whether helpers are alive while waiting for them
+    LIVENESS_INTERVAL = 0.1
+
+    _transposition_table: TranspositionTable
+    _stop: Any
+    _nodes: Any
+    _tasks: List[multiprocessing.Queue]
+    _results: multiprocessing.Queue
+    _processes: List[multiprocessing.Process]
+    _running: int
+    _best: Optional[HelperResult]
+
+    def __init__(self, helpers: int, transposition_table: TranspositionTable):
+        """:param transposition_table: Shared transposition table (see `TranspositionTable`) used by the main search."""
+        if transposition_table.name is None:
+            raise ValueError('Lazy SMP requires shared transposition table')
+        self._transposition_table = transposition_table
+        context = multiprocessing.get_context('spawn')
+        self._stop = context.RawValue('b', 0)
+        self._nodes = context.RawArray('Q', helpers)
+        self._tasks = [context.Queue() for _ in range(helpers)]
+        self._results = context.Queue()
+        self._processes = [
+            context.Process(
+                target=_helper_main, args=(index, transposition_table, self._stop, self._nodes, tasks, self._results),
+                daemon=True,
+            )
+            for index, tasks in enumerate(self._tasks)
+        ]
+        for process in self._processes:
+            process.start()
+        # Number of helpers which haven't finished the current search yet
+        self._running = 0
+        self._best = None
+
+    @property
+    def helpers(self) -> int:
+        return len(self._processes)
+
+    @property
+    def alive(self) -> bool:
+        """`False` if some helper died (or helpers were terminated), then the pool can't be used anymore."""
+        return bool(self._processes) and all(process.is_alive() for process in self._processes)
+
+    @property
+    def nodes(self) -> int:
+        """Nodes searched by helpers in the current (or the last) search."""
+        return sum(self._nodes)
+
+    def start(self, board: Board, depth: Optional[int] = None, filter_moves: Optional[List[Move]] = None,
+              options: SearchOptions = DEFAULT_SEARCH_OPTIONS) -> None:
+        """Starts helper searches of given position (see `iterative_deepening_search`)."""
+        self._stop.value = 0
+        self._nodes[:] = [0] * self.helpers
+        filter_codes = [move.code for move in filter_moves] if filter_moves is not None else None
+        for index, tasks in enumerate(self._tasks):
+            start_depth = 1 + (index & 1)
+            tasks.put((board.fen(), max(depth, start_depth) if depth else None, start_depth, filter_codes, options))
+        self._running = self.helpers
+        self._best = None
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until helpers finish searches (of limited depth), returns `False` on timeout or when some helper died
+        (helpers are terminated then).
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while self._running:
+            interval = self.LIVENESS_INTERVAL
+            if deadline is not None:
+                interval = max(0.0, min(interval, deadline - time.monotonic()))
+            try:
+                _, result = self._results.get(timeout=interval)
+            except queue.Empty:
+                if not self.alive:
+                    self.terminate()
+                    return False
+                if deadline is not None and time.monotonic() >= deadline:
+                    return False
+                continue
+            if result is None:
+                self._running -= 1
+            elif self._best is None or result[0] > self._best[0]:
+                self._best = result
+        return True
+
+    def stop(self) -> Optional[HelperResult]:
+        """Stops helper searches and returns the deepest iteration completed by helpers."""
+        self._stop.value = 1
+        if not self.wait(self.STOP_TIMEOUT):
+            self.terminate()
+        return self._best
+
+    def terminate(self) -> None:
+        """Kills helpers, the pool can't be used anymore."""
+        for process in self._processes:
+            process.terminate()
+        for process in self._processes:
+            process.join()
+        self._processes = []
+        self._running = 0
+
+    def close(self) -> None:
+        self.stop()
+        for tasks in self._tasks[:len(self._processes)]:
+            tasks.put(None)
+        for process in self._processes:
+            process.join()
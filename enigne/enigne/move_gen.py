@@ -1,145 +1,430 @@
-from typing import Iterable, Optional
+from array import array
+from typing import Iterable, Optional, Tuple, Sequence, Iterator
 
-from .board import Board, Move, Rank, Square, Color, File
+from .attacks import KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, BISHOP_RAYS, ROOK_RAYS, BETWEEN, LINE, \
+    bishop_attacks, rook_attacks, queen_attacks
+from .board import Board, Move, Square, Color, Bitboard, iter_bits
 
+PROMOTIONS_PIECES = (Board.KNIGHT, Board.BISHOP, Board.ROOK, Board.QUEEN)
+FULL_BITBOARD = Bitboard((1 << 64) - 1)
 
-def _pawn_moves(board: Board, square: Square, color: Color) -> Iterable[Move]:
+
+def _pawn_moves(board: Board, start: int, color: Color, empty: Bitboard, enemy: Bitboard) -> Iterable[int]:
+    rank = start >> 3
     # Pawn ordinal moves
-    ahead = 1 if color == Board.WHITE else -1
-    end = square + (0, ahead)
-    if board[end] is None:
-        if square.rank != board.rel_rank(Rank(6)):
-            yield Move(square, end)
-            if square.rank == board.rel_rank(Rank(1)):
-                end = square + (0, 2 * ahead)
-                if board[end] is None:
-                    yield Move(square, end)
+    ahead = 8 if color == Board.WHITE else -8
+    end = start + ahead
+    if empty >> end & 1:
+        if rank != (6 if color == Board.WHITE else 1):
+            yield start | (end << 6)
+            if rank == (1 if color == Board.WHITE else 6) and empty >> (end + ahead) & 1:
+                yield start | ((end + ahead) << 6)
         else:
             # Promotions
-            for pr_pc in {Board.KNIGHT, Board.BISHOP, Board.ROOK, Board.QUEEN}:
-                yield Move(square, end, pr_pc)
+            for pr_pc in PROMOTIONS_PIECES:
+                yield start | (end << 6) | (pr_pc << 12)
 
     # Pawn Captures
-    for df in {-1, 1}:
-        end = square + (df, ahead)
-        opponent_pieces = board.opponent_pieces(end) if color == board.turn else board.own_pieces(end)
-        if end.is_valid() and opponent_pieces is not None:
-            if square.rank != board.rel_rank(Rank(6)):
-                yield Move(square, end)
-            else:
-                # Promotion capture
-                for pr_pc in {Board.KNIGHT, Board.BISHOP, Board.ROOK, Board.QUEEN}:
-                    yield Move(square, end, pr_pc)
+    attacks = PAWN_ATTACKS[color][start]
+    for end in iter_bits(attacks & enemy):
+        if rank != (6 if color == Board.WHITE else 1):
+            yield start | (end << 6)
+        else:
+            # Promotion capture
+            for pr_pc in PROMOTIONS_PIECES:
+                yield start | (end << 6) | (pr_pc << 12)
 
     # Enpassant
-    if board.enpassant is not None:
-        end = board.enpassant
-        for df in {-1, 1}:
-            start = end + (df, -ahead)
-            if start == square:
-                yield Move(start, end)
-                break
+    enpassant = board.enpassant
+    if enpassant is not None and attacks >> enpassant.index & 1:
+        yield start | (enpassant.index << 6)
+
+
+def move_codes_gen(board: Board, color: Optional[Color] = None) -> Iterable[int]:
+    """Generates pseudo-legal moves as packed move codes (see `Move`)."""
+    color = board.turn if color is None else color
+    own = board.occupancy(color)
+    enemy = board.occupancy(Board.WHITE if color == Board.BLACK else Board.BLACK)
+    empty = ~(own | enemy)
 
+    for start in iter_bits(board.bitboard(Board.PAWN, color)):
+        yield from _pawn_moves(board, start, color, empty, enemy)
 
-def _leaper_moves(board: Board, square: Square, m: int, n: int, color: Color) -> Iterable[Move]:
-    end = square + (m, n)
-    if end.is_valid() and board.pieces(end, color) is None:
-        yield Move(square, square + (m, n))
+    for start in iter_bits(board.bitboard(Board.KNIGHT, color)):
+        yield from (start | (end << 6) for end in iter_bits(KNIGHT_ATTACKS[start] & ~own))
 
+    for start in iter_bits(board.bitboard(Board.KING, color)):
+        yield from (start | (end << 6) for end in iter_bits(KING_ATTACKS[start] & ~own))
 
-def _rider_moves(board: Board, square: Square, m: int, n: int, color: Color) -> Iterable[Move]:
-    end = square
-    for step in range(7):
-        end = end + (m, n)
-        if not end.is_valid() or board.pieces(end, color) is not None:
-            break
-        yield Move(square, end)
-        if board.pieces(end, Board.WHITE if color == Board.BLACK else Board.BLACK) is not None:
-            break
+        if board.has_king_castling(color) and empty >> (start + 1) & 1 and empty >> (start + 2) & 1:
+            yield start | ((start + 2) << 6)
+
+        if board.has_queen_castling(color) \
+                and empty >> (start - 1) & 1 and empty >> (start - 2) & 1 and empty >> (start - 3) & 1:
+            yield start | ((start - 2) << 6)
+
+    occupied = own | enemy
+    riders = (Board.BISHOP, bishop_attacks), (Board.ROOK, rook_attacks), (Board.QUEEN, queen_attacks)
+    for piece, rider_attacks in riders:
+        for start in iter_bits(board.bitboard(piece, color)):
+            yield from (start | (end << 6) for end in iter_bits(rider_attacks(start, occupied) & ~own))
 
 
 def move_gen(board: Board, color: Optional[Color] = None) -> Iterable[Move]:
     """Generates pseudo-legal moves."""
-    color = board.turn if color is None else color
-    for square, piece in board.iter_pieces(color):
-        if piece == Board.PAWN:
-            yield from _pawn_moves(board, square, color)
-        elif piece == Board.KING:
-            yield from (
-                move
-                for m in {1, 0, -1} for n in {1, 0, -1}
-                for move in _leaper_moves(board, square, m, n, color)
-                if m != 0 or n != 0
-            )
-
-            if board.has_king_castling(color) \
-                    and board[square + (1, 0)] is None and board[square + (2, 0)] is None:
-
-                yield Move(square, square + (2, 0))
-
-            if board.has_queen_castling(color) and \
-                    board[square + (-1, 0)] is None and board[square + (-2, 0)] is None \
-                    and board[square + (-3, 0)] is None:
-
-                yield Move(square, square + (-2, 0))
-
-        elif piece == Board.KNIGHT:
-            yield from (
-                move
-                for m in {-2, -1, 1, 2} for n in {-2, -1, 1, 2}
-                for move in _leaper_moves(board, square, m, n, color)
-                if abs(m) + abs(n) == 3
-            )
-
-        elif piece == Board.ROOK:
-            yield from (
-                move
-                for m in {1, 0, -1} for n in {1, 0, -1}
-                for move in _rider_moves(board, square, m, n, color)
-                if abs(m) + abs(n) == 1
-            )
-
-        elif piece == Board.BISHOP:
-            yield from (
-                move
-                for m in {1, -1} for n in {1, -1}
-                for move in _rider_moves(board, square, m, n, color)
-            )
-
-        elif piece == Board.QUEEN:
-            yield from (
-                move
-                for m in {1, 0, -1} for n in {1, 0, -1}
-                for move in _rider_moves(board, square, m, n, color)
-                if m != 0 or n != 0
-            )
+    yield from (Move.from_code(code) for code in move_codes_gen(board, color))
+
+
+def attackers_bitboard(board: Board, index: int, color: Color, occupied: Optional[Bitboard] = None) -> Bitboard:
+    """Bitboard of pieces of given color attacking square with given index (with optionally modified occupancy)."""
+    occupied = board.occupied if occupied is None else occupied
+    bitboards = board.piece_bitboards(color)
+    queens = bitboards[Board.QUEEN]
+    return Bitboard(
+        (PAWN_ATTACKS[color ^ 1][index] & bitboards[Board.PAWN])
+        | (KNIGHT_ATTACKS[index] & bitboards[Board.KNIGHT])
+        | (KING_ATTACKS[index] & bitboards[Board.KING])
+        | (bishop_attacks(index, occupied) & (bitboards[Board.BISHOP] | queens))
+        | (rook_attacks(index, occupied) & (bitboards[Board.ROOK] | queens))
+    )
+
+
+def is_index_attacked(board: Board, index: int, color: Color, occupied: Optional[Bitboard] = None) -> bool:
+    """True if square with given index is attacked by given color (with optionally modified occupancy)."""
+    bitboards = board.piece_bitboards(color)
+    if PAWN_ATTACKS[color ^ 1][index] & bitboards[Board.PAWN] \
+            or KNIGHT_ATTACKS[index] & bitboards[Board.KNIGHT] \
+            or KING_ATTACKS[index] & bitboards[Board.KING]:
+        return True
+    queens = bitboards[Board.QUEEN]
+    bishops, rooks = bitboards[Board.BISHOP] | queens, bitboards[Board.ROOK] | queens
+    if not (bishops & BISHOP_RAYS[index] or rooks & ROOK_RAYS[index]):
+        return False
+    occupied = board.occupied if occupied is None else occupied
+    return bool(bishop_attacks(index, occupied) & bishops or rook_attacks(index, occupied) & rooks)
 
 
 def attackers(board: Board, square: Square, color: Optional[Color]) -> Iterable[Square]:
     """Returns square of pieces of given color that attacks given square."""
-    yield from (move.start for move in move_gen(board, color) if move.end == square)
+    color = board.turn if color is None else color
+    yield from (Square.from_index(index) for index in iter_bits(attackers_bitboard(board, square.index, color)))
 
 
 def is_attacked(board: Board, square: Square, color: Optional[Color]) -> bool:
     """True if square is attacked by given color."""
-    return any(True for _ in attackers(board, square, color))
+    return is_index_attacked(board, square.index, board.turn if color is None else color)
 
 
 def in_check(board: Board):
-    return is_attacked(board, board.own_king_square, board.opponent)
+    return is_index_attacked(board, board.king_index(board.turn), board.opponent)
+
+
+def pinned_bitboard(board: Board, color: Color) -> Bitboard:
+    """Pieces of given color pinned to their king."""
+    king = board.king_index(color)
+    own, occupied = board.occupancy(color), board.occupied
+    their = board.piece_bitboards(color ^ 1)
+    snipers = \
+        (ROOK_RAYS[king] & (their[Board.ROOK] | their[Board.QUEEN])) \
+        | (BISHOP_RAYS[king] & (their[Board.BISHOP] | their[Board.QUEEN]))
+    pinned = 0
+    for sniper in iter_bits(snipers):
+        blockers = BETWEEN[king][sniper] & occupied
+        if blockers and not blockers & (blockers - 1) and blockers & own:
+            pinned |= blockers
+    return Bitboard(pinned)
+
+
+LegalContext = Tuple[Bitboard, Bitboard, Bitboard]
+
+# Kinds of generated moves (bitmask)
+CAPTURES = 1  # captures (including enpassant and capturing promotions)
+PROMOTIONS = 2  # non-capturing promotions
+QUIETS = 4  # all other moves (including castling)
+ALL_MOVES = CAPTURES | PROMOTIONS | QUIETS
+
+
+def legal_context(board: Board) -> LegalContext:
+    """Checkers, pinned pieces and check evasion mask of side to move."""
+    us = board.turn
+    king = board.king_index(us)
+    checkers = attackers_bitboard(board, king, us ^ 1)
+    if not checkers:
+        evasion = FULL_BITBOARD
+    elif checkers & (checkers - 1):
+        evasion = Bitboard(0)
+    else:
+        evasion = Bitboard(checkers | BETWEEN[king][checkers.bit_length() - 1])
+    return checkers, pinned_bitboard(board, us), evasion
+
+
+def _append_pawn_move(moves: array, code: int, promotion: bool) -> None:
+    if promotion:
+        moves.extend(code | (pr_pc << 12) for pr_pc in PROMOTIONS_PIECES)
+    else:
+        moves.append(code)
+
+
+def generate_legal(board: Board, moves: array, kinds: int = ALL_MOVES, context: Optional[LegalContext] = None,
+                   starts: Bitboard = FULL_BITBOARD, ends: Bitboard = FULL_BITBOARD) -> array:
+    """
+    Appends legal moves of given `kinds` as packed move codes (see `Move`) to `moves`.
+
+    Checkers, pinned pieces and check evasion mask (`context`) are computed once per position so moves are never
+    tried on the board. Generation can be restricted to pieces standing on `starts` squares and moves to `ends`
+    squares (castling is generated only if `ends` is not restricted).
+    """
+    append = moves.append
+    us = board.turn
+    them = us ^ 1
+    bitboards, their = board.piece_bitboards(us), board.piece_bitboards(them)
+    own, enemy = board.occupancy(us), board.occupancy(them)
+    occupied = own | enemy
+    empty = ~occupied
+    king = board.king_index(us)
+    checkers, pinned, evasion = context = context or legal_context(board)
+    context_evasion = evasion
+
+    targets = ((enemy if kinds & CAPTURES else 0) | (empty if kinds & QUIETS else 0)) & ends
+
+    # King moves, king itself can not block attacks on squares it is moving to
+    if starts >> king & 1:
+        without_king = occupied ^ (1 << king)
+        for end in iter_bits(KING_ATTACKS[king] & targets):
+            if not is_index_attacked(board, end, them, without_king):
+                append(king | (end << 6))
+
+        # Castling, king can not be in check, and can not pass or land on attacked square
+        if kinds & QUIETS and not checkers and ends == FULL_BITBOARD:
+            if board.has_king_castling(us) and not occupied & (6 << king) \
+                    and not is_index_attacked(board, king + 1, them, occupied) \
+                    and not is_index_attacked(board, king + 2, them, occupied):
+                append(king | ((king + 2) << 6))
+            if board.has_queen_castling(us) and not occupied & (7 << (king - 3)) \
+                    and not is_index_attacked(board, king - 1, them, occupied) \
+                    and not is_index_attacked(board, king - 2, them, occupied):
+                append(king | ((king - 2) << 6))
+
+    if not evasion:
+        # Double check, only king can move
+        return moves
+
+    targets &= evasion
+    evasion &= ends
+
+    # Pawns
+    white = us == Board.WHITE
+    ahead = 8 if white else -8
+    promotion_rank, double_push_rank = (6, 1) if white else (1, 6)
+    enpassant = board.enpassant.index if board.enpassant is not None and kinds & CAPTURES else -1
+    if enpassant >= 0 and not ends >> enpassant & 1:
+        enpassant = -1
+    for start in iter_bits(bitboards[Board.PAWN] & starts):
+        mask = evasion & LINE[king][start] if pinned >> start & 1 else evasion
+        promotion = start >> 3 == promotion_rank
+        end = start + ahead
+        if kinds & (PROMOTIONS if promotion else QUIETS) and empty >> end & 1:
+            if mask >> end & 1:
+                _append_pawn_move(moves, start | (end << 6), promotion)
+            if start >> 3 == double_push_rank and empty >> (end + ahead) & 1 and mask >> (end + ahead) & 1:
+                append(start | ((end + ahead) << 6))
+        if kinds & CAPTURES:
+            attacks = PAWN_ATTACKS[us][start]
+            for end in iter_bits(attacks & enemy & mask):
+                _append_pawn_move(moves, start | (end << 6), promotion)
+            if enpassant >= 0 and attacks >> enpassant & 1:
+                captured = enpassant - ahead
+                if checkers and not checkers >> captured & 1 and not context_evasion >> enpassant & 1:
+                    continue
+                # Both pawns leave their squares at once so pins along rank have to be checked on resulting occupancy
+                after = (occupied ^ (1 << start) ^ (1 << captured)) | (1 << enpassant)
+                if bishop_attacks(king, after) & (their[Board.BISHOP] | their[Board.QUEEN]) \
+                        or rook_attacks(king, after) & (their[Board.ROOK] | their[Board.QUEEN]):
+                    continue
+                append(start | (enpassant << 6))
+
+    # Knights (pinned knight can not move at all)
+    for start in iter_bits(bitboards[Board.KNIGHT] & ~pinned & starts):
+        for end in iter_bits(KNIGHT_ATTACKS[start] & targets):
+            append(start | (end << 6))
+
+    # Riders
+    riders = (Board.BISHOP, bishop_attacks), (Board.ROOK, rook_attacks), (Board.QUEEN, queen_attacks)
+    for piece, rider_attacks in riders:
+        for start in iter_bits(bitboards[piece] & starts):
+            rider_targets = rider_attacks(start, occupied) & targets
+            if pinned >> start & 1:
+                rider_targets &= LINE[king][start]
+            for end in iter_bits(rider_targets):
+                append(start | (end << 6))
+
+    return moves
+
+
+def legal_move_codes(board: Board, kinds: int = ALL_MOVES) -> array:
+    """Legal moves of given `kinds` as packed move codes (see `Move`) in `array('H')`."""
+    return generate_legal(board, array('H'), kinds)
 
 
 def legal_move_gen(board: Board) -> Iterable[Move]:
-    for move in move_gen(board):
-        piece = board.own_pieces(move.start)
-        with board.do_move(move):
-            # King can not be attacked
-            legal = not is_attacked(board, board.opponent_king_square, board.turn)
-            # Castling attack rules
-            if legal and piece == board.KING and abs(move.start.file - move.end.file) == 2:
-                for f in (range(2, 5) if move.end.file == 2 else range(4, 7)):
-                    if is_attacked(board, Square(File(f), move.start.rank), board.turn):
-                        legal = False
-                        break
-        if legal:
-            yield move
+    yield from (Move.from_code(code) for code in legal_move_codes(board))
+
+
+def is_legal(board: Board, code: int, context: Optional[LegalContext] = None) -> bool:
+    """True if packed move is legal in given position (useful for moves from hash tables or killer slots)."""
+    start = code & 63
+    if not board.occupancy(board.turn) >> start & 1:
+        return False
+    return code in generate_legal(board, array('H'), ALL_MOVES, context, Bitboard(1 << start))
+
+
+def is_capture(board: Board, code: int) -> bool:
+    """True if packed move captures a piece (including enpassant)."""
+    end = (code >> 6) & 63
+    if board.occupancy(board.opponent) >> end & 1:
+        return True
+    enpassant = board.enpassant
+    return enpassant is not None and enpassant.index == end \
+        and bool(board.bitboard(Board.PAWN, board.turn) >> (code & 63) & 1)
+
+
+def _generate_quiet_checks(board: Board, moves: array, context: LegalContext) -> array:
+    """Appends legal non-capturing non-promoting moves giving check (direct or discovered)."""
+    us = board.turn
+    bitboards = board.piece_bitboards(us)
+    king = board.king_index(us ^ 1)
+    occupied = board.occupied
+    start = len(moves)
+
+    # Direct checks, piece moves to square from which it attacks enemy king
+    bishop_checks, rook_checks = bishop_attacks(king, occupied), rook_attacks(king, occupied)
+    for piece, checks in (
+            (Board.PAWN, PAWN_ATTACKS[us ^ 1][king]),
+            (Board.KNIGHT, KNIGHT_ATTACKS[king]),
+            (Board.BISHOP, bishop_checks),
+            (Board.ROOK, rook_checks),
+            (Board.QUEEN, bishop_checks | rook_checks)):
+        if bitboards[piece] and checks:
+            generate_legal(board, moves, QUIETS, context, bitboards[piece], checks)
+
+    # Discovered checks, own piece blocking own rider moves out of line with enemy king
+    discoverers = 0
+    snipers = \
+        (ROOK_RAYS[king] & (bitboards[Board.ROOK] | bitboards[Board.QUEEN])) \
+        | (BISHOP_RAYS[king] & (bitboards[Board.BISHOP] | bitboards[Board.QUEEN]))
+    for sniper in iter_bits(snipers):
+        blockers = BETWEEN[king][sniper] & occupied
+        if blockers and not blockers & (blockers - 1) and blockers & board.occupancy(us):
+            discoverers |= blockers
+    if discoverers:
+        direct = set(moves[start:])
+        for code in generate_legal(board, array('H'), QUIETS, context, Bitboard(discoverers)):
+            if code not in direct and not LINE[king][code & 63] >> ((code >> 6) & 63) & 1:
+                moves.append(code)
+    return moves
+
+
+def capture_move_codes(board: Board, promotions: bool = True, checks: bool = False) -> array:
+    """
+    Legal captures as packed move codes (see `Move`) in `array('H')`, optionally with non-capturing promotions
+    and quiet moves giving check. Quiet moves are never generated.
+    """
+    context = legal_context(board)
+    moves = generate_legal(board, array('H'), CAPTURES | (PROMOTIONS if promotions else 0), context)
+    if checks:
+        _generate_quiet_checks(board, moves, context)
+    return moves
+
+
+def capture_gen(board: Board, promotions: bool = True, checks: bool = False) -> Iterable[Move]:
+    """Generates legal captures (see `capture_move_codes`)."""
+    yield from (Move.from_code(code) for code in capture_move_codes(board, promotions, checks))
+
+
+def evasion_move_codes(board: Board) -> array:
+    """
+    Legal moves of side in check as packed move codes (see `Move`) in `array('H')`. Only king moves, captures of
+    checking piece and interpositions are generated. There are no moves when side to move is not in check.
+    """
+    context = legal_context(board)
+    if not context[0]:
+        return array('H')
+    return generate_legal(board, array('H'), ALL_MOVES, context)
+
+
+def evasion_gen(board: Board) -> Iterable[Move]:
+    """Generates legal check evasions (see `evasion_move_codes`)."""
+    yield from (Move.from_code(code) for code in evasion_move_codes(board))
+
+
+class MovePicker:
+    """
+    Lazily yields legal moves (packed move codes) in stages: transposition table move, captures, other tactical moves
+    (promotions), killer moves and quiet moves. Moves of given stage are generated only when search asks for them,
+    so in case of cutoff remaining stages are never generated.
+    """
+    TT_MOVE, CAPTURES, TACTICAL, KILLERS, QUIETS, DONE = range(6)
+
+    _board: Board
+    _tt_move: int
+    _killers: Sequence[int]
+    _context: Optional[LegalContext]
+    stage: int
+
+    def __init__(self, board: Board, tt_move: int = 0, killers: Sequence[int] = ()):
+        self._board = board
+        self._tt_move = tt_move
+        self._killers = killers
+        self._context = None
+        self.stage = self.TT_MOVE
+
+    @property
+    def context(self) -> LegalContext:
+        if self._context is None:
+            self._context = legal_context(self._board)
+        return self._context
+
+    def order_captures(self, moves: array) -> Iterable[int]:
+        """Orders generated captures, descendants may prioritize them."""
+        return moves
+
+    def order_quiets(self, moves: array) -> Iterable[int]:
+        """Orders generated quiet moves, descendants may prioritize them."""
+        return moves
+
+    def killer_moves(self) -> Iterable[int]:
+        """Killer move candidates, asked only when killers stage is reached."""
+        return self._killers
+
+    def __iter__(self) -> Iterator[int]:
+        board = self._board
+        tt_move = self._tt_move
+        if tt_move and is_legal(board, tt_move, self.context):
+            yield tt_move
+        else:
+            tt_move = 0
+
+        self.stage = self.CAPTURES
+        for code in self.order_captures(generate_legal(board, array('H'), CAPTURES, self.context)):
+            if code != tt_move:
+                yield code
+
+        self.stage = self.TACTICAL
+        for code in generate_legal(board, array('H'), PROMOTIONS, self.context):
+            if code != tt_move:
+                yield code
+
+        self.stage = self.KILLERS
+        killers = []
+        for code in self.killer_moves():
+            if code and code != tt_move and code not in killers and not is_capture(board, code) and code >> 12 == 0 \
+                    and is_legal(board, code, self.context):
+                killers.append(code)
+                yield code
+
+        self.stage = self.QUIETS
+        for code in self.order_quiets(generate_legal(board, array('H'), QUIETS, self.context)):
+            if code != tt_move and code not in killers:
+                yield code
+
+        self.stage = self.DONE
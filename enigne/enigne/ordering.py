@@ -0,0 +1,82 @@
+from array import array
+from typing import Iterable, List, Tuple
+
+from .board import Board, Color
+from .move_gen import MovePicker, is_capture
+
+# Order of captured and capturing pieces for MVV-LVA indexed by piece
+_VICTIM_ORDER = [0, 1, 2, 2, 3, 4, 5]
+_ATTACKER_ORDER = [0, 1, 2, 2, 3, 4, 5]
+
+
+def mvv_lva(board: Board, code: int) -> int:
+    """Ordering key of capture, most valuable victim first, then least valuable attacker."""
+    victim = board.piece_at((code >> 6) & 63)
+    attacker = board.piece_at(code & 63)
+    # Empty target square means enpassant
+    return (_VICTIM_ORDER[victim[0]] if victim else 1) * 8 - _ATTACKER_ORDER[attacker[0]]
+
+
+class MoveOrdering:
+    """
+    Move ordering tables of a search: two killer moves (quiet moves causing beta cutoff) per ply and butterfly history
+    (cutoff counts weighted by depth) indexed by color, start and end square.
+    """
+    KILLERS = 2
+    HISTORY_MAX = 1 << 24
+
+    killers: array
+    history: array
+
+    def __init__(self, max_ply: int = Board.MAX_PLY):
+        self.killers = array('H', bytes(2 * self.KILLERS * max_ply))
+        self.history = array('l', bytes(8 * 2 * 64 * 64))
+
+    def clear(self) -> None:
+        for table in (self.killers, self.history):
+            table[:] = array(table.typecode, bytes(len(table) * table.itemsize))
+
+    def ply_killers(self, ply: int) -> Tuple[int, int]:
+        index = ply * self.KILLERS
+        return self.killers[index], self.killers[index + 1]
+
+    def cutoff(self, board: Board, code: int, depth: int, ply: int) -> None:
+        """Updates tables by move causing beta cutoff in given position (only quiet moves are recorded)."""
+        if code >> 12 or is_capture(board, code):
+            return
+        killers = self.killers
+        index = ply * self.KILLERS
+        if killers[index] != code:
+            killers[index + 1] = killers[index]
+            killers[index] = code
+        history = self.history
+        index = (board.turn << 12) | (code & 0xFFF)
+        history[index] += depth * depth
+        if history[index] > self.HISTORY_MAX:
+            for index in range(len(history)):
+                history[index] >>= 1
+
+    def history_score(self, color: Color, code: int) -> int:
+        return self.history[(color << 12) | (code & 0xFFF)]
+
+
+class OrderedMovePicker(MovePicker):
+    """Move picker ordering captures by MVV-LVA and quiet moves by history, using killer moves of given ply."""
+    _ordering: MoveOrdering
+    _ply: int
+
+    def __init__(self, board: Board, ordering: MoveOrdering, ply: int, tt_move: int = 0):
+        super().__init__(board, tt_move)
+        self._ordering = ordering
+        self._ply = ply
+
+    def killer_moves(self) -> Iterable[int]:
+        return self._ordering.ply_killers(self._ply)
+
+    def order_captures(self, moves: array) -> List[int]:
+        board = self._board
+        return sorted(moves, key=lambda code: mvv_lva(board, code), reverse=True)
+
+    def order_quiets(self, moves: array) -> Iterable[int]:
+        history, offset = self._ordering.history, self._board.turn << 12
+        return sorted(moves, key=lambda code: history[offset | (code & 0xFFF)], reverse=True)
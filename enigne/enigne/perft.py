@@ -1,24 +1,238 @@
-from typing import Dict, Union, Tuple
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Union, Tuple, Optional, List, Iterable, Iterator, Any
 
 from .board import Board, Move
-from .move_gen import legal_move_gen
+from .move_gen import legal_move_codes
+from .transposition import BucketHashTable
 
 
-def perft(board: Board, depth: int, divide: bool = False) -> Union[int, Tuple[int, Dict[Move, int]]]:
+class PerftHashTable(BucketHashTable):
+    """
+    Bounded cache of perft subtree node counts keyed by position hash and remaining depth.
+
+    Data word of entry packs node count with depth (lowest 8 bits).
+    """
+
+    @staticmethod
+    def _depth(data: int) -> int:
+        return data & 0xFF
+
+    def get(self, key: int, depth: int) -> Optional[int]:
+        """Node count of subtree of given depth of position with given hash (`None` if not in the table)."""
+        self.probes += 1
+        slot = self._find(key)
+        if slot < 0:
+            return None
+        data = self._table[slot + 1]
+        if data & 0xFF != depth:
+            return None
+        self.hits += 1
+        return data >> 8
+
+    def put(self, key: int, depth: int, nodes: int) -> None:
+        self.stores += 1
+        self._write(self._replace_index(key, depth), key, (nodes << 8) | depth)
+
+
+_worker_hash_table: Optional[PerftHashTable] = None
+
+
+def _init_worker(hash_mb: float) -> None:
+    global _worker_hash_table
+    _worker_hash_table = PerftHashTable(hash_mb) if hash_mb else None
+
+
+def _perft_subtree(fen: str, codes: List[int], depth: int, bulk: bool) -> Tuple[int, int, int, int]:
+    """Node count of subtree and probes, hits and stores of worker hash table made by counting it."""
+    board = Board(fen)
+    for code in codes:
+        board.push_code(code)
+    table = _worker_hash_table
+    if table is None:
+        return perft(board, depth, bulk=bulk), 0, 0, 0
+    probes, hits, stores = table.probes, table.hits, table.stores
+    nodes = perft(board, depth, bulk=bulk, hash_table=table)
+    return nodes, table.probes - probes, table.hits - hits, table.stores - stores
+
+
+def _parallel_perft(board: Board, depth: int, bulk: bool, hash_table: Optional[PerftHashTable],
+                    workers: int) -> Tuple[int, Dict[Move, int]]:
+    """Splits tree at the root (or at the second ply for better load balance) and runs subtrees in process pool."""
+    fen = board.fen()
+    split_depth = 2 if depth >= 3 else 1
+    tasks = []
+    for code in legal_move_codes(board):
+        if split_depth == 1:
+            tasks.append((code, [code]))
+        else:
+            board.push_code(code)
+            tasks.extend((code, [code, child]) for child in legal_move_codes(board))
+            board.pop()
+
+    divided: Dict[Move, int] = {Move.from_code(code): 0 for code in legal_move_codes(board)}
+    hash_mb = hash_table.size_mb if hash_table is not None else 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(hash_mb, )) as executor:
+        futures = [
+            (root, executor.submit(_perft_subtree, fen, codes, depth - split_depth, bulk))
+            for root, codes in tasks
+        ]
+        for root, future in futures:
+            nodes, probes, hits, stores = future.result()
+            divided[Move.from_code(root)] += nodes
+            if hash_table is not None:
+                hash_table.probes += probes
+                hash_table.hits += hits
+                hash_table.stores += stores
+    return sum(divided.values()), divided
+
+
+def perft(board: Board, depth: int, divide: bool = False, bulk: bool = True,
+          hash_table: Optional[PerftHashTable] = None, workers: int = 1) -> Union[int, Tuple[int, Dict[Move, int]]]:
+    """
+    Counts leaf nodes of legal move tree of given depth.
+    :param divide: If `True` node counts of subtrees of all root moves are returned as well.
+    :param bulk: If `True` leaf moves are only counted (last ply moves are not made on the board).
+    :param hash_table: Optional cache of node counts of already visited subtrees. Every worker process uses its own
+        table of the same size, their probes, hits and stores are added to statistics of the given table.
+    :param workers: Number of worker processes.
+    """
     if depth == 0:
         return 1
 
+    if workers > 1 and depth > 1:
+        total_nodes, divided = _parallel_perft(board, depth, bulk, hash_table, workers)
+        return (total_nodes, divided) if divide else total_nodes
+
+    use_hash = hash_table is not None and depth > 1 and not divide
+    if use_hash:
+        nodes = hash_table.get(board.zobrist_hash, depth)
+        if nodes is not None:
+            return nodes
+
+    moves = legal_move_codes(board)
+    if bulk and depth == 1 and not divide:
+        return len(moves)
+
     total_nodes = 0
-    moves: Dict[Move, int] = {}
-    for move in legal_move_gen(board):
-        with board.do_move(move):
-            move_nodes = perft(board, depth - 1)
-            total_nodes += move_nodes
-            if divide:
-                if move in moves:
-                    assert False
-                moves[move] = move_nodes
+    divided: Dict[Move, int] = {}
+    for code in moves:
+        board.push_code(code)
+        move_nodes = perft(board, depth - 1, bulk=bulk, hash_table=hash_table)
+        board.pop()
+        total_nodes += move_nodes
+        if divide:
+            move = Move.from_code(code)
+            if move in divided:
+                assert False
+            divided[move] = move_nodes
+
+    if use_hash:
+        hash_table.put(board.zobrist_hash, depth, total_nodes)
+
     if divide:
-        return total_nodes, moves
+        return total_nodes, divided
     else:
         return total_nodes
+
+
+# Operation of EPD with expected perft node count of given depth
+_PERFT_OPERATION = re.compile(r'[Dd](\d+)\s+(\d+)')
+
+
+def parse_epd(line: str) -> Tuple[str, Dict[int, int]]:
+    """
+    Parses EPD line with expected perft node counts, e.g. `<fen> ;D1 20 ;D2 400`.
+    Missing halfmove and fullmove counters of FEN are completed, other operations than `D<depth> <nodes>` (e.g.
+    `bm e4` or `id "pos1"`) are ignored.
+    :return: FEN and dictionary of expected node counts indexed by depth.
+    """
+    first, *operations = [part.strip() for part in line.split(';')]
+    fields = first.split()
+    fields, rest = fields[:4], fields[4:]
+    counters = ['0', '1']
+    if len(rest) >= 2 and rest[0].isdigit() and rest[1].isdigit():
+        counters, rest = rest[:2], rest[2:]
+    # The first operation may follow position fields without separator
+    operations.append(' '.join(rest))
+    expected = {}
+    for operation in operations:
+        match = _PERFT_OPERATION.fullmatch(operation)
+        if match:
+            expected[int(match.group(1))] = int(match.group(2))
+    return ' '.join(fields + counters), expected
+
+
+def run_perft_suite(lines: Iterable[str], max_depth: Optional[int] = None,
+                    hash_table: Optional[PerftHashTable] = None, workers: int = 1) -> Iterator[Dict[str, Any]]:
+    """
+    Runs perft for all positions and depths (up to `max_depth`) of EPD lines and yields results as they are computed.
+    Results include hash table statistics if `hash_table` is given.
+    """
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        fen, expected = parse_epd(line)
+        board = Board(fen)
+        for depth, expected_nodes in sorted(expected.items()):
+            if max_depth is not None and depth > max_depth:
+                break
+            if hash_table is not None:
+                hash_table.clear()
+            start = time.perf_counter()
+            nodes = perft(board, depth, hash_table=hash_table, workers=workers)
+            duration = time.perf_counter() - start
+            result = {
+                'fen': fen,
+                'depth': depth,
+                'nodes': nodes,
+                'expected': expected_nodes,
+                'ok': nodes == expected_nodes,
+                'time': duration,
+                'nps': int(nodes / duration) if duration else 0,
+            }
+            if hash_table is not None:
+                result.update(hash_probes=hash_table.probes, hash_hits=hash_table.hits,
+                              hash_hit_rate=hash_table.hit_rate)
+            yield result
+
+
+def summarize_perft_suite(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    nodes = sum(result['nodes'] for result in results)
+    duration = sum(result['time'] for result in results)
+    summary = {
+        'positions': len({result['fen'] for result in results}),
+        'runs': len(results),
+        'failed': sum(not result['ok'] for result in results),
+        'nodes': nodes,
+        'time': duration,
+        'nps': int(nodes / duration) if duration else 0,
+        'results': results,
+    }
+    if any('hash_probes' in result for result in results):
+        probes = sum(result.get('hash_probes', 0) for result in results)
+        hits = sum(result.get('hash_hits', 0) for result in results)
+        summary.update(hash_probes=probes, hash_hits=hits, hash_hit_rate=hits / probes if probes else 0.0)
+    return summary
+
+
+def find_nps_regressions(summary: Dict[str, Any], baseline: Dict[str, Any],
+                         threshold: float = 0.1) -> List[Dict[str, Any]]:
+    """
+    Compares NPS of perft suite summary with baseline summary (per position, depth and in aggregate).
+    :param threshold: Relative NPS drop considered as regression.
+    :return: List of regressions.
+    """
+    baseline_nps = {(result['fen'], result['depth']): result['nps'] for result in baseline.get('results', [])}
+    regressions = []
+    for result in summary['results']:
+        reference = baseline_nps.get((result['fen'], result['depth']))
+        if reference and result['nps'] < reference * (1 - threshold):
+            regressions.append({
+                'fen': result['fen'], 'depth': result['depth'], 'nps': result['nps'], 'baseline_nps': reference
+            })
+    if baseline.get('nps') and summary['nps'] < baseline['nps'] * (1 - threshold):
+        regressions.append({'fen': None, 'depth': None, 'nps': summary['nps'], 'baseline_nps': baseline['nps']})
+    return regressions
@@ -2,14 +2,42 @@ from __future__ import annotations
 
 import math
 import time
-from typing import Tuple, List, Optional, Iterator, Dict, Any, Container
+from array import array
+from typing import Tuple, List, Optional, Iterator, Dict, Any, Container, ContextManager, Callable, Union, \
+    Iterable
 from contextlib import contextmanager
 
 from enigne.board import Board, Move
-from enigne.eval import evaluate_material
-from enigne.move_gen import legal_move_gen, in_check
+from enigne.eval import evaluate_material, MATERIAL_SCORES
+from enigne.move_gen import MovePicker, in_check, is_legal, capture_move_codes, evasion_move_codes
+from enigne.ordering import MoveOrdering, OrderedMovePicker, mvv_lva
+from enigne.transposition import TranspositionTable
 
 MATE_SCORE = 32767
+MAX_DEPTH = 64
+# Half width of the first aspiration window around score of the previous iteration, it is doubled on every fail
+ASPIRATION_WINDOW = 1
+ASPIRATION_MAX_WINDOW = 8
+# Captures which can't raise score above alpha even with this margin are not searched in quiescence search
+DELTA_MARGIN = 2
+
+# Selective search (see `SearchOptions`)
+NULL_MOVE_MIN_DEPTH = 2
+NULL_MOVE_REDUCTION = 2
+REVERSE_FUTILITY_DEPTH = 3
+REVERSE_FUTILITY_MARGIN = 2  # per ply of depth
+FUTILITY_MARGINS = (3, 5)  # indexed by depth - 1
+LMR_MIN_DEPTH = 3
+LMR_MIN_MOVES = 3  # number of moves searched without reduction
+LMR_LATE_MOVES = 6  # number of moves searched before reduction is increased
+
+_PIECE_VALUES = [0] + [MATERIAL_SCORES[piece] for piece in (Board.PAWN, Board.BISHOP, Board.KNIGHT, Board.ROOK,
+                                                            Board.QUEEN, Board.KING)]
+# Largest gain of capture in quiescence search: capture of queen, with promotion if pawn can promote
+_MAX_GAIN = _PIECE_VALUES[Board.QUEEN]
+_MAX_PROMOTION_GAIN = 2 * _PIECE_VALUES[Board.QUEEN] - _PIECE_VALUES[Board.PAWN]
+# Ranks of pawns promoting by the next move indexed by color
+_PROMOTING_RANKS = (0x00FF000000000000, 0x000000000000FF00)
 
 
 class SearchVisitor:
@@ -136,6 +164,8 @@ class PVSearchVisitor(SearchVisitor):
 
 
 class StatsSearchVisitor(SearchVisitor):
+    """Counts nodes (searched moves) of the whole tree in the root visitor, which is shared by all children."""
+    _root: StatsSearchVisitor
     _nodes: int
     _start_clock: Optional[float]
     _end_clock: Optional[float]
@@ -143,6 +173,7 @@ class StatsSearchVisitor(SearchVisitor):
 
     def __init__(self, parent: Optional[StatsSearchVisitor] = None):
         super().__init__(parent=parent)
+        self._root = parent._root if parent else self
         self._nodes = 0
         self._start_clock = None
         self._end_clock = None
@@ -165,13 +196,7 @@ class StatsSearchVisitor(SearchVisitor):
             return self._end_clock - self._start_clock
 
     def current_move(self, move: Move) -> None:
-        self._inc_nodes()
-
-    def _inc_nodes(self):
-        if self.parent:
-            self.parent._inc_nodes()
-        else:
-            self._nodes += 1
+        self._root._nodes += 1
 
     def start(self):
         self._start_clock = time.perf_counter()
@@ -181,26 +206,27 @@ class StatsSearchVisitor(SearchVisitor):
 
 
 class TimeoutHaltSearchVisitor(SearchVisitor):
+    _root: TimeoutHaltSearchVisitor
     _timeout: float
+    _deadline: Optional[float]
     _child: TimeoutHaltSearchVisitor
 
     def __init__(self, timeout: float, parent: Optional[TimeoutHaltSearchVisitor] = None):
         super().__init__(parent=parent)
+        self._root = parent._root if parent else self
         self._timeout = timeout
-        self._start_clock = None
+        self._deadline = None
 
     def _create_child(self) -> TimeoutHaltSearchVisitor:
         return TimeoutHaltSearchVisitor(self._timeout, parent=self)
 
     @property
     def halt(self):
-        if self.parent:
-            return self.parent.halt
-
-        return time.perf_counter() - self._start_clock > self._timeout
+        return time.perf_counter() > self._root._deadline
 
     def start(self):
-        self._start_clock = time.perf_counter()
+        if not self._parent:
+            self._deadline = time.perf_counter() + self._timeout
 
 
 class NodesCountHaltSearchVisitor(StatsSearchVisitor):
@@ -216,10 +242,7 @@ class NodesCountHaltSearchVisitor(StatsSearchVisitor):
 
     @property
     def halt(self):
-        if self.parent:
-            return self.parent.halt
-
-        return self.nodes >= self._nodes_limit
+        return self._root._nodes >= self._nodes_limit
 
 
 class BagOfSearchVisitors(SearchVisitor):
@@ -275,39 +298,752 @@ class BagOfSearchVisitors(SearchVisitor):
         return any(visitor.skip(move) for visitor in self.visitors.values())
 
 
-def alphabeta_search(board: Board, depth: int, alpha: float = -math.inf,
-                     beta: float = math.inf, visitor: SearchVisitor = SearchVisitor()) -> float:
-    """Negamax implementation of alpha-beta pruning."""
-    with visitor:
-        if depth == 0:
-            return evaluate_material(board)
-
-        mate = True
-        for move in legal_move_gen(board):
-            if visitor.skip(move):
+class SearchOptions:
+    """Switches of selective search techniques of `alphabeta_search` (all of them are enabled by default)."""
+    null_move: bool
+    late_move_reductions: bool
+    futility: bool
+    reverse_futility: bool
+
+    def __init__(self, null_move: bool = True, late_move_reductions: bool = True, futility: bool = True,
+                 reverse_futility: bool = True):
+        self.null_move = null_move
+        self.late_move_reductions = late_move_reductions
+        self.futility = futility
+        self.reverse_futility = reverse_futility
+
+
+DEFAULT_SEARCH_OPTIONS = SearchOptions()
+NO_PRUNING_SEARCH_OPTIONS = SearchOptions(False, False, False, False)
+
+
+class SearchContext:
+    """
+    Node counter and halting conditions shared by the whole search (all nodes and iterations). Conditions (deadline,
+    nodes limit, `on_poll` callback and halt of search hooks) are checked only every `poll_nodes` nodes, so reading
+    `nodes` and `halted` by the search is just attribute access. When deadline approaches, polling interval is
+    shortened according to measured time per node, so the search doesn't overrun the deadline by more than a few
+    nodes.
+    """
+    POLL_NODES = 64
+
+    nodes: int
+    halted: bool
+    start_clock: float
+    deadline: Optional[float]
+    nodes_limit: Optional[int]
+    poll_nodes: int
+    next_poll: int
+    hooks: Optional[SearchHooks]
+    _on_poll: Optional[Callable[[SearchContext], bool]]
+
+    def __init__(self, timeout: Optional[float] = None, nodes_limit: Optional[int] = None,
+                 poll_nodes: int = POLL_NODES, on_poll: Optional[Callable[[SearchContext], bool]] = None):
+        """
+        :param timeout: Search is halted after given number of seconds from creation of the context.
+        :param nodes_limit: Search is halted after given number of nodes (exactly, not only when polled).
+        :param on_poll: Called every `poll_nodes` nodes, search is halted when it returns `True`.
+        """
+        self.nodes = 0
+        self.halted = False
+        self.start_clock = time.monotonic()
+        self.deadline = self.start_clock + timeout if timeout is not None else None
+        self.nodes_limit = nodes_limit
+        self.poll_nodes = poll_nodes
+        # Time per node is unknown until the first poll
+        self.next_poll = 1 if timeout is not None else poll_nodes
+        if nodes_limit is not None:
+            self.next_poll = min(self.next_poll, nodes_limit)
+        self.hooks = None
+        self._on_poll = on_poll
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.start_clock
+
+    def stop(self) -> None:
+        """Halts the search (it can be called from other thread)."""
+        self.halted = True
+
+    def poll(self) -> bool:
+        """Checks halting conditions, it is called by the search when `nodes` reaches `next_poll`."""
+        nodes = self.nodes
+        interval = self.poll_nodes
+        if self.deadline is not None:
+            now = time.monotonic()
+            if now >= self.deadline:
+                self.halted = True
+            elif nodes:
+                # Next poll at about half of the remaining time
+                node_time = (now - self.start_clock) / nodes
+                interval = max(1, min(interval, int((self.deadline - now) / (2 * node_time))))
+        self.next_poll = nodes + interval
+        if self.nodes_limit is not None:
+            if nodes >= self.nodes_limit:
+                self.halted = True
+            self.next_poll = min(self.next_poll, self.nodes_limit)
+        if self._on_poll is not None and self._on_poll(self):
+            self.halted = True
+        if self.hooks is not None and self.hooks.halt:
+            self.halted = True
+        return self.halted
+
+
+class SearchHooks:
+    """
+    Flat instrumentation of the search: unlike `SearchVisitor` tree, one object serves all nodes of the search.
+
+    Root events (moves searched in the root and new best moves of the root) are separate from node events, which are
+    called in every node (including the root) with its ply, but only when `node_events` is `True`, otherwise
+    the search doesn't call them at all. Node events get move codes (see `Move.code`) instead of moves.
+    """
+    node_events = False
+
+    @property
+    def halt(self) -> bool:
+        """If this returns `True` search is stopped, it is polled by `SearchContext`."""
+        return False
+
+    def start(self) -> None:
+        """Called before beginning of the search"""
+        pass
+
+    def end(self) -> None:
+        """Called when search is finished"""
+        pass
+
+    def skip_root(self, move: Move) -> bool:
+        """Skip searching of given move in the root"""
+        return False
+
+    def root_move(self, move: Move) -> None:
+        """Called when search of given move in the root has been started."""
+        pass
+
+    def root_best_move(self, score: float, pv: List[Move], is_principal_variation: bool = False) -> None:
+        """
+        Called when new best move of the root is found (except after halt), see `SearchVisitor.new_best_move`.
+        :param pv: Principal variation starting by the move (only the move if it is not principal variation), it may
+            be truncated by transposition table cutoffs.
+        """
+        pass
+
+    def enter(self, ply: int) -> None:
+        """Node event: search of node at given ply has been started."""
+        pass
+
+    def leave(self, ply: int) -> None:
+        """Node event: search of node at given ply is finished."""
+        pass
+
+    def skip(self, ply: int, code: int) -> bool:
+        """Node event: skip searching of given move."""
+        return False
+
+    def current_move(self, ply: int, code: int) -> None:
+        """Node event: search of given move has been started."""
+        pass
+
+    def new_best_move(self, ply: int, score: float, is_principal_variation: bool = False) -> None:
+        """Node event: the current move is the best one."""
+        pass
+
+    def mated(self, ply: int) -> None:
+        """Node event: side to move is mated."""
+        pass
+
+    def stalemated(self, ply: int) -> None:
+        """Node event: side to move is stalemated."""
+        pass
+
+
+class VisitorSearchHooks(SearchHooks):
+    """
+    Adapts `SearchVisitor` tree to hooks: children of the visitor are created for every node as `SearchVisitor`
+    expects, they are kept in preallocated stack indexed by ply.
+    """
+    node_events = True
+
+    _root_ply: int
+    _visitors: List[SearchVisitor]
+    _contexts: List[Optional[ContextManager[SearchVisitor]]]
+
+    def __init__(self, visitor: SearchVisitor, root_ply: int = 0):
+        self._root_ply = root_ply
+        self._visitors = [visitor] * Board.MAX_PLY
+        self._contexts = [None] * Board.MAX_PLY
+
+    @property
+    def visitor(self) -> SearchVisitor:
+        return self._visitors[self._root_ply]
+
+    @property
+    def halt(self) -> bool:
+        return self._visitors[self._root_ply].halt
+
+    def start(self) -> None:
+        self._visitors[self._root_ply].start()
+
+    def end(self) -> None:
+        self._visitors[self._root_ply].end()
+
+    def enter(self, ply: int) -> None:
+        if ply == self._root_ply:
+            return
+        context = self._visitors[ply - 1].child()
+        self._contexts[ply] = context
+        self._visitors[ply] = visitor = context.__enter__()
+        visitor.start()
+
+    def leave(self, ply: int) -> None:
+        if ply == self._root_ply:
+            return
+        self._visitors[ply].end()
+        self._contexts[ply].__exit__(None, None, None)
+        self._contexts[ply] = None
+
+    def skip(self, ply: int, code: int) -> bool:
+        return self._visitors[ply].skip(Move.from_code(code))
+
+    def current_move(self, ply: int, code: int) -> None:
+        self._visitors[ply].current_move(Move.from_code(code))
+
+    def new_best_move(self, ply: int, score: float, is_principal_variation: bool = False) -> None:
+        self._visitors[ply].new_best_move(score, is_principal_variation=is_principal_variation)
+
+    def mated(self, ply: int) -> None:
+        self._visitors[ply].mated()
+
+    def stalemated(self, ply: int) -> None:
+        self._visitors[ply].stalemated()
+
+
+class FilterMovesSearchHooks(SearchHooks):
+    """White lists moves to search in the root"""
+    _moves: Container[Move]
+
+    def __init__(self, moves: Container[Move]):
+        self._moves = moves
+
+    def skip_root(self, move: Move) -> bool:
+        return move not in self._moves
+
+
+class BagOfSearchHooks(SearchHooks):
+    """Passes events to all given hooks, node events are passed only to hooks which listen to them."""
+    _hooks: List[SearchHooks]
+    _node_hooks: List[SearchHooks]
+
+    def __init__(self, hooks: Iterable[SearchHooks]):
+        self._hooks = list(hooks)
+        self._node_hooks = [hooks for hooks in self._hooks if hooks.node_events]
+        self.node_events = bool(self._node_hooks)
+
+    @property
+    def halt(self) -> bool:
+        return any(hooks.halt for hooks in self._hooks)
+
+    def start(self) -> None:
+        for hooks in self._hooks:
+            hooks.start()
+
+    def end(self) -> None:
+        for hooks in self._hooks:
+            hooks.end()
+
+    def skip_root(self, move: Move) -> bool:
+        return any(hooks.skip_root(move) for hooks in self._hooks)
+
+    def root_move(self, move: Move) -> None:
+        for hooks in self._hooks:
+            hooks.root_move(move)
+
+    def root_best_move(self, score: float, pv: List[Move], is_principal_variation: bool = False) -> None:
+        for hooks in self._hooks:
+            hooks.root_best_move(score, pv, is_principal_variation)
+
+    def enter(self, ply: int) -> None:
+        for hooks in self._node_hooks:
+            hooks.enter(ply)
+
+    def leave(self, ply: int) -> None:
+        for hooks in self._node_hooks:
+            hooks.leave(ply)
+
+    def skip(self, ply: int, code: int) -> bool:
+        return any(hooks.skip(ply, code) for hooks in self._node_hooks)
+
+    def current_move(self, ply: int, code: int) -> None:
+        for hooks in self._node_hooks:
+            hooks.current_move(ply, code)
+
+    def new_best_move(self, ply: int, score: float, is_principal_variation: bool = False) -> None:
+        for hooks in self._node_hooks:
+            hooks.new_best_move(ply, score, is_principal_variation)
+
+    def mated(self, ply: int) -> None:
+        for hooks in self._node_hooks:
+            hooks.mated(ply)
+
+    def stalemated(self, ply: int) -> None:
+        for hooks in self._node_hooks:
+            hooks.stalemated(ply)
+
+
+def search_hooks(visitor: Union[SearchHooks, SearchVisitor, None] = None, root_ply: int = 0) -> SearchHooks:
+    """Hooks of given hooks or visitor (adapted by `VisitorSearchHooks`), no-op hooks for `None`."""
+    if visitor is None:
+        return SearchHooks()
+    if isinstance(visitor, SearchHooks):
+        return visitor
+    return VisitorSearchHooks(visitor, root_ply)
+
+
+class _SearchState:
+    """
+    State shared by all nodes of one search. Search functions are chosen when it is created: node events are called
+    by wrappers, which are used only if hooks listen to them.
+    """
+    __slots__ = ('hooks', 'node_events', 'context', 'tt', 'ordering', 'options', 'moves', 'pv_table', 'pv_length',
+                 'pv_moves', 'pv_ply', 'best_code', 'alphabeta', 'quiescence')
+
+    def __init__(self, hooks: SearchHooks, transposition_table: Optional[TranspositionTable], ordering: MoveOrdering,
+                 options: SearchOptions, context: Optional[SearchContext] = None):
+        self.hooks = hooks
+        self.node_events = hooks.node_events
+        if context is None:
+            # Visitors may halt after any node
+            context = SearchContext(poll_nodes=1 if isinstance(hooks, VisitorSearchHooks) else SearchContext.POLL_NODES)
+        context.hooks = hooks
+        self.context = context
+        self.tt = transposition_table
+        self.ordering = ordering
+        self.options = options
+        # Code of move searched in every ply
+        self.moves = array('H', bytes(2 * Board.MAX_PLY))
+        # Triangular table of principal variations: variation of node at ply is stored in row `ply` (starting at
+        # `ply * Board.MAX_PLY`) from column `ply` to column `pv_length[ply]` (exclusive)
+        self.pv_table = array('H', bytes(2 * Board.MAX_PLY * Board.MAX_PLY))
+        self.pv_length = array('H', bytes(2 * Board.MAX_PLY))
+        # Principal variation of the previous iteration, searched first without transposition table
+        self.pv_moves = array('H')
+        # Length of the prefix of searched line matching `pv_moves`, node at ply is on that variation if it equals ply
+        self.pv_ply = 0
+        # Best move of the root found before halt
+        self.best_code = 0
+        if self.node_events:
+            self.alphabeta, self.quiescence = _alphabeta_with_node_events, _quiescence_with_node_events
+        else:
+            self.alphabeta, self.quiescence = _alphabeta, _quiescence
+
+    def update_pv(self, ply: int, code: int) -> None:
+        """Principal variation of node at given ply is given move followed by principal variation of its child."""
+        row = ply * Board.MAX_PLY
+        child_row = row + Board.MAX_PLY
+        end = self.pv_length[ply + 1]
+        pv_table = self.pv_table
+        pv_table[row + ply] = code
+        pv_table[row + ply + 1:row + end] = pv_table[child_row + ply + 1:child_row + end]
+        self.pv_length[ply] = end
+
+    def pv(self, ply: int = 0) -> List[Move]:
+        """Copy of principal variation of node at given ply."""
+        row = ply * Board.MAX_PLY
+        return [Move.from_code(code) for code in self.pv_table[row + ply:row + self.pv_length[ply]]]
+
+
+def _quiescence_with_node_events(board: Board, alpha: float, beta: float, ply: int, state: _SearchState) -> float:
+    state.hooks.enter(ply)
+    try:
+        return _quiescence(board, alpha, beta, ply, state)
+    finally:
+        state.hooks.leave(ply)
+
+
+def _alphabeta_with_node_events(board: Board, depth: int, alpha: float, beta: float, ply: int, state: _SearchState,
+                                allow_null_move: bool = True) -> float:
+    if depth == 0:
+        return _quiescence_with_node_events(board, alpha, beta, ply, state)
+    state.hooks.enter(ply)
+    try:
+        return _alphabeta(board, depth, alpha, beta, ply, state, allow_null_move)
+    finally:
+        state.hooks.leave(ply)
+
+
+def quiescence_search(board: Board, alpha: float = -math.inf, beta: float = math.inf,
+                      visitor: Union[SearchHooks, SearchVisitor, None] = None,
+                      context: Optional[SearchContext] = None) -> float:
+    """
+    Searches only captures and promotions (all evasions when in check) to evaluate quiet positions only.
+    Side to move may stand pat (score is at least static evaluation) and captures which can't raise score to alpha
+    are pruned (delta pruning).
+    :param visitor: Hooks (or visitor) of the search.
+    :param context: Node counter and halting conditions of the search.
+    """
+    hooks = search_hooks(visitor)
+    state = _SearchState(hooks, None, MoveOrdering(), DEFAULT_SEARCH_OPTIONS, context)
+    start_ply = board.ply
+    hooks.start()
+    try:
+        return state.quiescence(board, alpha, beta, 0, state)
+    finally:
+        board.unwind(start_ply)
+        hooks.end()
+
+
+def _quiescence(board: Board, alpha: float, beta: float, ply: int, state: _SearchState) -> float:
+    state.pv_length[ply] = ply
+    hooks = state.hooks
+    node_events = state.node_events
+    context = state.context
+    check = in_check(board)
+    if check:
+        codes = evasion_move_codes(board)
+        if not codes:
+            if node_events:
+                hooks.mated(ply)
+            return -MATE_SCORE
+    else:
+        stand_pat = evaluate_material(board)
+        if stand_pat >= beta:
+            return beta
+        turn = board.turn
+        max_gain = _MAX_PROMOTION_GAIN if board.bitboard(Board.PAWN, turn) & _PROMOTING_RANKS[turn] else _MAX_GAIN
+        if stand_pat + max_gain + DELTA_MARGIN <= alpha:
+            return alpha
+        if stand_pat > alpha:
+            alpha = stand_pat
+        codes = sorted(capture_move_codes(board), key=lambda c: mvv_lva(board, c), reverse=True)
+
+    for code in codes:
+        if not check:
+            captured = board.piece_at((code >> 6) & 63)
+            gain = _PIECE_VALUES[captured[0]] if captured else _PIECE_VALUES[Board.PAWN] if code >> 12 == 0 else 0
+            if code >> 12:
+                gain += _PIECE_VALUES[code >> 12] - _PIECE_VALUES[Board.PAWN]
+            if stand_pat + gain + DELTA_MARGIN <= alpha:
                 continue
 
-            visitor.current_move(move)
+        if context.halted:
+            return alpha
+
+        state.moves[ply] = code
+        if node_events:
+            hooks.current_move(ply, code)
+        context.nodes += 1
+        if context.nodes >= context.next_poll:
+            context.poll()
+        board.push_code(code)
+        score = -state.quiescence(board, -beta, -alpha, ply + 1, state)
+        board.pop()
+        if score >= beta:
+            if node_events:
+                hooks.new_best_move(ply, score)
+            return beta
+        if score > alpha:
+            if node_events:
+                hooks.new_best_move(ply, score, True)
+            alpha = score
+
+    return alpha
 
-            mate = False
-            with board.do_move(move), visitor.child() as child_visitor:
-                score = alphabeta_search(board, depth - 1, -beta, -alpha, child_visitor)
-            score *= -1
-            if score >= beta and score != math.inf:
-                visitor.new_best_move(score)
-                return beta
-            if score > alpha:
-                visitor.new_best_move(score, is_principal_variation=True)
-                alpha = score
-            if visitor.halt:
-                return score
-
-        if mate:
-            if in_check(board):
-                visitor.mated()
-                return -MATE_SCORE
-            else:
-                visitor.stalemated()
-                return 0
 
+def alphabeta_search(board: Board, depth: int, alpha: float = -math.inf,
+                     beta: float = math.inf, visitor: Union[SearchHooks, SearchVisitor, None] = None,
+                     transposition_table: Optional[TranspositionTable] = None, ply: int = 0,
+                     ordering: Optional[MoveOrdering] = None, options: SearchOptions = DEFAULT_SEARCH_OPTIONS,
+                     allow_null_move: bool = True, context: Optional[SearchContext] = None) -> float:
+    """
+    Negamax implementation of alpha-beta pruning with principal variation search: the first move is searched with
+    full window, other moves with null window around alpha (proving they are not better) and they are re-searched
+    with full window only if they fail high. Moves made on the board are undone even when the search is interrupted
+    by an exception (e.g. raised by hooks).
+
+    Search is selective (see `SearchOptions`), below the root:
+    - null move pruning: if opponent can't reach beta even when side to move passes (searched with reduced depth),
+      node fails high; it is not used in check, after another null move and without pieces (zugzwang),
+    - reverse futility pruning: near leaves node fails high if static evaluation exceeds beta by margin,
+    - futility pruning: near leaves quiet moves are not searched if static evaluation is below alpha by margin,
+    - late move reductions: quiet moves ordered late (with poor history) are searched with reduced depth first.
+    :param visitor: Hooks (see `SearchHooks`) or visitor of the search, visitors are adapted by `VisitorSearchHooks`.
+    :param transposition_table: Optional table of results of already searched positions used for cutoffs (except
+        the root) and as the first move to try.
+    :param ply: Distance from the root of the search.
+    :param ordering: Killer and history tables, new ones are created when not given.
+    :param allow_null_move: `False` after null move.
+    :param context: Node counter and halting conditions of the search, visitors are polled after every node when
+        it is not given.
+    """
+    hooks = search_hooks(visitor, ply)
+    state = _SearchState(hooks, transposition_table, MoveOrdering() if ordering is None else ordering, options,
+                         context)
+    start_ply = board.ply
+    hooks.start()
+    try:
+        return state.alphabeta(board, depth, alpha, beta, ply, state, allow_null_move)
+    finally:
+        board.unwind(start_ply)
+        hooks.end()
+
+
+def _alphabeta(board: Board, depth: int, alpha: float, beta: float, ply: int, state: _SearchState,
+               allow_null_move: bool = True) -> float:
+    if depth == 0:
+        return state.quiescence(board, alpha, beta, ply, state)
+    state.pv_length[ply] = ply
+    context = state.context
+    if context.halted:
         return alpha
+    hooks = state.hooks
+    node_events = state.node_events
+    options = state.options
+    ordering = state.ordering
+
+    tt = state.tt
+    tt_move = 0
+    follow_pv = False
+    if tt is not None:
+        entry = tt.probe(board.zobrist_hash)
+        if entry is not None:
+            tt_depth, tt_score, bound, tt_move = entry
+            if ply and tt_depth >= depth:
+                if bound == tt.EXACT:
+                    return tt_score
+                if bound == tt.LOWER and tt_score >= beta:
+                    return beta
+                if bound == tt.UPPER and tt_score <= alpha:
+                    return alpha
+    elif state.pv_ply == ply and ply < len(state.pv_moves):
+        # Node of the previous principal variation
+        tt_move = state.pv_moves[ply]
+        follow_pv = True
+
+    check = in_check(board)
+    static_eval = None
+    if ply and not check and abs(beta) < MATE_SCORE:
+        static_eval = evaluate_material(board)
+
+        if options.reverse_futility and depth <= REVERSE_FUTILITY_DEPTH \
+                and static_eval - REVERSE_FUTILITY_MARGIN * depth >= beta:
+            return beta
+
+        if options.null_move and allow_null_move and depth >= NULL_MOVE_MIN_DEPTH and static_eval >= beta:
+            turn = board.turn
+            if board.occupancy(turn) & ~(board.bitboard(Board.PAWN, turn) | board.bitboard(Board.KING, turn)):
+                board.push_null()
+                score = -state.alphabeta(board, max(0, depth - 1 - NULL_MOVE_REDUCTION), -beta, -beta + 1, ply + 1,
+                                         state, False)
+                board.pop_null()
+                if score >= beta or context.halted:
+                    return beta
+
+    futile = options.futility and static_eval is not None and depth <= len(FUTILITY_MARGINS) \
+        and static_eval + FUTILITY_MARGINS[depth - 1] <= alpha
+    reduce = options.late_move_reductions and depth >= LMR_MIN_DEPTH and not check
+    root = not ply
+
+    mate = True
+    skipped = False
+    best_code = 0
+    searched = 0
+    picker = OrderedMovePicker(board, ordering, ply, tt_move)
+    for code in picker:
+        if (root and hooks.skip_root(Move.from_code(code))) or (node_events and hooks.skip(ply, code)):
+            skipped = True
+            continue
+        mate = False
+
+        quiet = picker.stage >= picker.KILLERS
+        gives_check = False
+        if quiet and searched and (futile or reduce):
+            board.push_code(code)
+            gives_check = in_check(board)
+            board.pop()
+            if futile and not gives_check:
+                continue
+
+        reduction = 0
+        if reduce and quiet and searched >= LMR_MIN_MOVES and not gives_check:
+            reduction = 1 if searched < LMR_LATE_MOVES else 2
+            if ordering.history_score(board.turn, code) > 0:
+                reduction -= 1
+            reduction = min(reduction, depth - 2)
+
+        state.moves[ply] = code
+        if follow_pv:
+            state.pv_ply = ply + 1 if code == tt_move else ply
+        if root:
+            hooks.root_move(Move.from_code(code))
+        if node_events:
+            hooks.current_move(ply, code)
+        context.nodes += 1
+        if context.nodes >= context.next_poll:
+            context.poll()
+
+        board.push_code(code)
+        if not searched:
+            score = -state.alphabeta(board, depth - 1, -beta, -alpha, ply + 1, state)
+        else:
+            score = -state.alphabeta(board, depth - 1 - reduction, -alpha - 1, -alpha, ply + 1, state)
+            if reduction and score > alpha and not context.halted:
+                score = -state.alphabeta(board, depth - 1, -alpha - 1, -alpha, ply + 1, state)
+            if alpha < score < beta and not context.halted:
+                score = -state.alphabeta(board, depth - 1, -beta, -alpha, ply + 1, state)
+        board.pop()
+        searched += 1
+
+        if score >= beta and score != math.inf:
+            _best_move_events(score, code, ply, state, False)
+            ordering.cutoff(board, code, depth, ply)
+            if tt is not None and not skipped and not context.halted:
+                tt.store(board.zobrist_hash, depth, beta, tt.LOWER, code)
+            return beta
+        if score > alpha:
+            state.update_pv(ply, code)
+            _best_move_events(score, code, ply, state, True)
+            alpha = score
+            best_code = code
+        if context.halted:
+            return score
+
+    if mate:
+        if check:
+            if node_events:
+                hooks.mated(ply)
+            return -MATE_SCORE
+        else:
+            if node_events:
+                hooks.stalemated(ply)
+            return 0
+
+    if tt is not None and not skipped and not math.isinf(alpha):
+        if best_code:
+            tt.store(board.zobrist_hash, depth, alpha, tt.EXACT, best_code)
+        else:
+            tt.store(board.zobrist_hash, depth, alpha, tt.UPPER)
+
+    return alpha
+
+
+def _best_move_events(score: float, code: int, ply: int, state: _SearchState, is_principal_variation: bool) -> None:
+    """New best move of a node, in the root it is recorded unless the search has been halted."""
+    hooks = state.hooks
+    if not ply:
+        if state.context.halted:
+            return
+        state.best_code = code
+        hooks.root_best_move(score, state.pv() if is_principal_variation else [Move.from_code(code)],
+                             is_principal_variation)
+    if state.node_events:
+        hooks.new_best_move(ply, score, is_principal_variation)
+
+
+def principal_variation(board: Board, transposition_table: TranspositionTable, max_length: int = MAX_DEPTH) -> List[Move]:
+    """Follows best moves stored in transposition table from given position (until illegal or repeated position)."""
+    codes = []
+    seen = set()
+    while len(codes) < max_length and board.zobrist_hash not in seen:
+        seen.add(board.zobrist_hash)
+        entry = transposition_table.probe(board.zobrist_hash)
+        if entry is None or not entry[3] or not is_legal(board, entry[3]):
+            break
+        codes.append(entry[3])
+        board.push_code(entry[3])
+    for _ in codes:
+        board.pop()
+    return [Move.from_code(code) for code in codes]
+
+
+def iterative_deepening_search(board: Board, depth: Optional[int] = None,
+                               visitor: Union[SearchHooks, SearchVisitor, None] = None,
+                               transposition_table: Optional[TranspositionTable] = None,
+                               options: SearchOptions = DEFAULT_SEARCH_OPTIONS, start_depth: int = 1,
+                               on_iteration: Optional[Callable[[int, float, Move, List[Move]], None]] = None,
+                               context: Optional[SearchContext] = None) -> Tuple[float, Optional[Move], List[Move]]:
+    """
+    Runs `alphabeta_search` with increasing depth until given depth is reached or visitor halts the search.
+    Every iteration searches aspiration window around score of the previous one (re-searching with wider window on
+    fail) and principal variation of the previous iteration is searched first (it is seeded to transposition table if
+    any).
+    :param depth: Maximal depth, `None` means until halted.
+    :param visitor: Hooks (or visitor) of the search, they are started and ended once for all iterations.
+    :param start_depth: Depth of the first iteration.
+    :param on_iteration: Called with depth, score, best move and principal variation of every completed iteration.
+    :param context: Node counter and halting conditions of the search (see `alphabeta_search`).
+    :return: Score, best move and principal variation of the deepest completed iteration. If the last iteration was
+        halted, its best move is returned if it has been found (search of the first move, which is the best move of
+        the previous iteration, is completed), if none iteration has been completed the first legal move is returned.
+    """
+    tt = transposition_table
+    hooks = search_hooks(visitor)
+    state = _SearchState(hooks, tt, MoveOrdering(), options, context)
+    context = state.context
+    score, best_move, pv = 0, None, []
+    start_ply = board.ply
+    hooks.start()
+    try:
+        for code in MovePicker(board):
+            if not hooks.skip_root(Move.from_code(code)) and not (state.node_events and hooks.skip(0, code)):
+                best_move = Move.from_code(code)
+                break
+
+        for iteration_depth in range(start_depth, (MAX_DEPTH if depth is None else depth) + 1):
+            if tt is not None and pv:
+                for move in pv:
+                    tt.store_move(board.zobrist_hash, move.code)
+                    board.push_code(move.code)
+                for _ in pv:
+                    board.pop()
+            elif tt is None:
+                state.pv_moves = array('H', (move.code for move in pv))
+
+            window = ASPIRATION_WINDOW
+            if pv and abs(score) < MATE_SCORE:
+                alpha, beta = score - window, score + window
+            else:
+                alpha, beta = -math.inf, math.inf
+
+            state.best_code = 0
+            while True:
+                state.pv_ply = 0
+                iteration_score = state.alphabeta(board, iteration_depth, alpha, beta, 0, state)
+                if context.halted:
+                    break
+                if alpha < iteration_score < beta:
+                    break
+                window *= 2
+                if iteration_score <= alpha:
+                    alpha = score - window if window <= ASPIRATION_MAX_WINDOW else -math.inf
+                else:
+                    beta = score + window if window <= ASPIRATION_MAX_WINDOW else math.inf
+
+            if state.best_code:
+                best_move = Move.from_code(state.best_code)
+            if context.halted:
+                break
+
+            score = iteration_score
+            if best_move is None:
+                # Mate or stalemate in the root
+                break
+            pv = state.pv()
+            if pv[:1] != [best_move]:
+                pv = [best_move]
+            if tt is not None and len(pv) < iteration_depth:
+                # Variation is truncated by transposition table cutoffs
+                for move in pv:
+                    board.push_code(move.code)
+                tail = principal_variation(board, tt, iteration_depth - len(pv))
+                for _ in pv:
+                    board.pop()
+                pv += tail
+            if on_iteration is not None:
+                on_iteration(iteration_depth, score, best_move, pv)
+    finally:
+        board.unwind(start_ply)
+        hooks.end()
+
+    if pv and pv[0] != best_move:
+        pv = [best_move]
+    return score, best_move, pv
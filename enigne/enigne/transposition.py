@@ -0,0 +1,178 @@
+from abc import ABC, abstractmethod
+from array import array
+from typing import Optional, Tuple, Union, Dict, Any
+
+# (depth, score, bound, move code)
+TTEntry = Tuple[int, int, int, int]
+
+
+class BucketHashTable(ABC):
+    """
+    Base of bounded tables keyed by position hash.
+
+    Entries are stored in preallocated `array('Q')`, each takes two words: data word (zero means empty entry) and
+    position hash xor-ed with the data word. Table is organized to buckets of two entries: the first one is replaced
+    only by deeper (or equally deep) results or by results of the same position, the second one is always replaced.
+    """
+    ENTRY_SIZE = 16
+
+    _table: Union[array, memoryview]
+    _mask: int
+    size_mb: float
+    probes: int
+    hits: int
+    stores: int
+
+    def __init__(self, size_mb: float):
+        buckets = max(1, int(size_mb * 2 ** 20) // (2 * self.ENTRY_SIZE))
+        buckets = 1 << (buckets.bit_length() - 1)
+        self._table = self._allocate(buckets * 2 * self.ENTRY_SIZE)
+        self._mask = buckets - 1
+        self.size_mb = size_mb
+        self.probes = self.hits = self.stores = 0
+
+    def _allocate(self, size: int) -> Union[array, memoryview]:
+        return array('Q', bytes(size))
+
+    @staticmethod
+    @abstractmethod
+    def _depth(data: int) -> int:
+        """Depth packed in data word."""
+        pass
+
+    @property
+    def size(self) -> int:
+        """Number of entries."""
+        return len(self._table) // 2
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes else 0.0
+
+    def clear(self) -> None:
+        self._table[:] = array('Q', bytes(len(self._table) * self._table.itemsize))
+        self.probes = self.hits = self.stores = 0
+
+    def _find(self, key: int) -> int:
+        """Index of entry of position with given hash (-1 if not in the table)."""
+        table = self._table
+        index = (key & self._mask) << 2
+        for slot in (index, index + 2):
+            data = table[slot + 1]
+            if data and table[slot] ^ data == key:
+                return slot
+        return -1
+
+    def _replace_index(self, key: int, depth: int) -> int:
+        """Index of entry replaced by result of given depth of position with given hash."""
+        table = self._table
+        index = (key & self._mask) << 2
+        data = table[index + 1]
+        if depth >= self._depth(data) or table[index] ^ data == key:
+            # Depth preferred slot
+            return index
+        # Always replace slot
+        return index + 2
+
+    def _write(self, index: int, key: int, data: int) -> None:
+        self._table[index] = key ^ data
+        self._table[index + 1] = data
+
+
+class TranspositionTable(BucketHashTable):
+    """
+    Bounded table of search results keyed by position hash.
+
+    Data word of entry packs score (upper 32 bits, with offset), bound type, depth and best move code. Table can be
+    allocated in shared memory: entry written concurrently by another process is torn and its hash doesn't match, so
+    shared table needs no locks.
+    """
+    # Bound types of stored scores
+    EXACT, LOWER, UPPER = 1, 2, 3
+
+    _SCORE_OFFSET = 1 << 31
+
+    _shared: bool
+    _name: Optional[str]
+    _shared_memory: Optional[Any]
+    _owner: bool
+
+    def __init__(self, size_mb: float = 16, shared: bool = False, name: Optional[str] = None):
+        """
+        :param shared: If `True` table is allocated in `multiprocessing.shared_memory` and it can be used by other
+            processes (forked or unpickled), it has to be released by `close`.
+        :param name: Name of shared memory of existing table to attach to.
+        """
+        self._shared = shared
+        self._name = name
+        super().__init__(size_mb)
+
+    def _allocate(self, size: int) -> Union[array, memoryview]:
+        if self._shared or self._name is not None:
+            from multiprocessing.shared_memory import SharedMemory
+            self._owner = self._name is None
+            self._shared_memory = SharedMemory(self._name, create=self._owner, size=size)
+            return self._shared_memory.buf[:size].cast('Q')
+        self._owner = False
+        self._shared_memory = None
+        return super()._allocate(size)
+
+    @staticmethod
+    def _depth(data: int) -> int:
+        return (data >> 16) & 0xFF
+
+    def __getstate__(self) -> Dict[str, Any]:
+        if self._shared_memory is None:
+            raise TypeError('Only shared transposition table can be passed to other process')
+        return {'size_mb': self.size_mb, 'name': self.name}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(state['size_mb'], name=state['name'])
+
+    @property
+    def name(self) -> Optional[str]:
+        """Name of shared memory (`None` if table is not shared)."""
+        return self._shared_memory.name if self._shared_memory is not None else None
+
+    def close(self) -> None:
+        """Releases shared memory (it is destroyed by process which created it)."""
+        if self._shared_memory is not None:
+            self._table.release()
+            self._shared_memory.close()
+            if self._owner:
+                self._shared_memory.unlink()
+            self._shared_memory = None
+            self._table = array('Q')
+
+    def probe(self, key: int) -> Optional[TTEntry]:
+        """Stored depth, score, bound type and best move (0 if unknown) of position with given hash."""
+        self.probes += 1
+        slot = self._find(key)
+        if slot < 0:
+            return None
+        self.hits += 1
+        data = self._table[slot + 1]
+        return (data >> 16) & 0xFF, (data >> 32) - self._SCORE_OFFSET, (data >> 24) & 0xFF, data & 0xFFFF
+
+    def store(self, key: int, depth: int, score: int, bound: int, move: int = 0) -> None:
+        """
+        Stores search result of position with given hash.
+        :param bound: One of `EXACT`, `LOWER` (score is at least given value) and `UPPER` (at most given value).
+        :param move: Best move code, when it is 0 best move already stored for the same position is kept.
+        """
+        self.stores += 1
+        table = self._table
+        index = self._replace_index(key, depth)
+        data = table[index + 1]
+        if not move and table[index] ^ data == key:
+            move = data & 0xFFFF
+        self._write(index, key,
+                    ((int(score) + self._SCORE_OFFSET) << 32) | (bound << 24) | (min(depth, 0xFF) << 16) | move)
+
+    def store_move(self, key: int, move: int) -> None:
+        """Sets best move of position with given hash keeping stored search result (if any), seeds move ordering."""
+        slot = self._find(key)
+        if slot < 0:
+            self.store(key, 0, 0, 0, move)
+        else:
+            self._write(slot, key, (self._table[slot + 1] & ~0xFFFF) | move)
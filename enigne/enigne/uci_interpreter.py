@@ -1,79 +1,84 @@
 from __future__ import annotations
 
 import threading
+import time
 from itertools import dropwhile, takewhile
 from time import sleep
 from typing import Dict, List, Set, Optional
 
 from .board import Move
 from .engine import EngineBase
-from .search import PVSearchVisitor, StatsSearchVisitor, BagOfSearchVisitors
+from .search import SearchHooks
 
 
-class UciSearchVisitor(BagOfSearchVisitors):
-    _interpreter: Optional[UciInterpreter]
-    _stats: StatsSearchVisitor
-    _pv: PVSearchVisitor
+class UciSearchHooks(SearchHooks):
+    """Reports moves searched in the root and principal variations found by the search as UCI `info`."""
+    _interpreter: UciInterpreter
+    _start_clock: Optional[float]
+    _pv: List[Move]
 
-    def __init__(self, interpreter: UciInterpreter, parent: Optional[UciSearchVisitor] = None):
-        if not parent:
-            self._stats = StatsSearchVisitor()
-            self._pv = PVSearchVisitor()
-            visitors = {'pv': self._pv, 'stats': self._stats}
-        else:
-            visitors = parent._visitors
-        super().__init__(visitors, parent=parent)
-        if parent:
-            self._stats = self._visitors['stats']
-            self._pv = self._visitors['pv']
+    def __init__(self, interpreter: UciInterpreter):
         self._interpreter = interpreter
+        self._start_clock = None
+        self._pv = []
 
-    def _create_child(self) -> UciSearchVisitor:
-        return UciSearchVisitor(self._interpreter, parent=self)
+    @property
+    def pv(self) -> List[Move]:
+        return self._pv
 
     @property
-    def stats(self) -> StatsSearchVisitor:
-        return self._stats
+    def best_move(self) -> Optional[Move]:
+        return self._pv[0] if self._pv else None
 
     @property
-    def pv(self) -> PVSearchVisitor:
-        return self._pv
+    def duration(self) -> float:
+        return time.perf_counter() - self._start_clock if self._start_clock is not None else 0.0
 
-    def current_move(self, move: Move) -> None:
-        super().current_move(move)
-        if not self._parent:
-            self._interpreter.write('info', currmove=move)
-
-    def new_best_move(self, score: float, is_principal_variation=False) -> None:
-        super().new_best_move(score, is_principal_variation)
-        if not self._parent and is_principal_variation:
-            self._interpreter.write(
-                'info',
-                depth=len(self.pv.pv),
-                score=f'cp {int(score * 100)}',
-                nodes=self.stats.nodes,
-                time=int(1000 * self.stats.duration),
-                pv=' '.join([str(m) for m in self.pv.pv])
-            )
+    @property
+    def nodes(self) -> int:
+        """Nodes searched by the engine (including parallel helpers)."""
+        engine = self._interpreter.engine
+        context = engine.search_context
+        return (context.nodes if context is not None else 0) + engine.helper_nodes
+
+    def start(self) -> None:
+        self._start_clock = time.perf_counter()
+        self._pv = []
+
+    def root_move(self, move: Move) -> None:
+        self._interpreter.write('info', currmove=move)
+
+    def root_best_move(self, score: float, pv: List[Move], is_principal_variation: bool = False) -> None:
+        if not is_principal_variation:
+            return
+        self._pv = pv
+        self._interpreter.write(
+            'info',
+            depth=len(pv),
+            score=f'cp {int(score * 100)}',
+            nodes=self.nodes,
+            time=int(1000 * self.duration),
+            pv=' '.join([str(m) for m in pv])
+        )
 
 
 class UciInterpreter:
     WAITING_STEP = 0.005
 
     _engine: EngineBase
-    _search_visitor: UciSearchVisitor
+    _search_hooks: UciSearchHooks
     _search_monitor_thread: Optional[threading.Thread]
 
     def __init__(self, engine: EngineBase):
         self._output_io = None
-        self._search_visitor = UciSearchVisitor(self)
+        self._search_hooks = UciSearchHooks(self)
         self._engine = engine
-        self._engine.set_search_visitor(self._search_visitor)
+        self._engine.set_search_visitor(self._search_hooks)
         self._search_monitor_thread = None
 
     @property
-    def search_visitor(self) -> UciSearchVisitor:
-        return self._search_visitor
+    def search_hooks(self) -> UciSearchHooks:
+        return self._search_hooks
 
     def write(self, *args, **kwargs):
         msg = []
@@ -136,9 +141,16 @@ class UciInterpreter:
         return [
             f"id name {info.get('name','Unknown')}",
             f"id author {info.get('author','Unknown')}",
+            *(f"option name {name} {definition}" for name, definition in self.engine.options().items()),
             "uciok",
         ]
 
+    def setoption(self, *args):
+        cmds = self.parse_command_args({'name', 'value'}, *args)
+        value = ' '.join(cmds['value']) if 'value' in cmds else None
+        self.engine.set_option(' '.join(cmds.get('name', [])), value)
+        return []
+
     def isready(self):
         while self.engine.search_in_progress:
             sleep(self.WAITING_STEP)
@@ -208,17 +220,21 @@ class UciInterpreter:
             )
 
         def monitor_search(interpreter: UciInterpreter):
-            stats = interpreter.search_visitor.stats
-            pv = interpreter.search_visitor.pv
+            stats = interpreter.search_hooks
+
+            def write_nodes():
+                nodes = stats.nodes
+                self.write('info', npc=int(nodes / stats.duration) if stats.duration else 0, nodes=nodes)
+
             i = 0
             while not interpreter.engine.search_done:
                 i = (i + 1) % int(1 / interpreter.WAITING_STEP)
                 sleep(interpreter.WAITING_STEP)
                 if i == 0:
-                    self.write('info', npc=int(stats.nodes / stats.duration), nodes=stats.nodes)
+                    write_nodes()
 
-            self.write('info', npc=int(stats.nodes / stats.duration), nodes=stats.nodes)
-            self.write(bestmove=pv.best_move)
+            write_nodes()
+            self.write(bestmove=interpreter.engine.search_done)
 
         # if self._search_monitor_thread:
         #     self._search_monitor_thread.join(timeout=1)
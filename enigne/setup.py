@@ -11,6 +11,7 @@ setup(
     version=about['__version__'],
     author=about['__author__'],
     packages=find_packages(),
-    scripts=['bin/enigne-perft', 'bin/enigne'],
+    scripts=['bin/enigne-perft', 'bin/enigne-bench', 'bin/enigne'],
+    python_requires='>=3.8',
     tests_require=['pytest', 'pytest-console-scripts'],
 )
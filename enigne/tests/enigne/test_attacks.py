@@ -0,0 +1,48 @@
+import random
+
+import pytest
+
+from enigne.attacks import KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, rook_attacks, bishop_attacks, queen_attacks, \
+    _rider_attacks, ROOK_DIRECTIONS, BISHOP_DIRECTIONS
+from enigne.board import Board, Square, iter_bits
+
+
+def _squares(bitboard):
+    return {str(Square.from_index(index)) for index in iter_bits(bitboard)}
+
+
+@pytest.mark.parametrize('table, square, expected', [
+    (KNIGHT_ATTACKS, 'a1', {'b3', 'c2'}),
+    (KNIGHT_ATTACKS, 'e4', {'d6', 'f6', 'g5', 'g3', 'f2', 'd2', 'c3', 'c5'}),
+    (KING_ATTACKS, 'h8', {'g8', 'g7', 'h7'}),
+    (KING_ATTACKS, 'e1', {'d1', 'd2', 'e2', 'f2', 'f1'}),
+    (PAWN_ATTACKS[Board.WHITE], 'a2', {'b3'}),
+    (PAWN_ATTACKS[Board.WHITE], 'e4', {'d5', 'f5'}),
+    (PAWN_ATTACKS[Board.BLACK], 'h7', {'g6'}),
+    (PAWN_ATTACKS[Board.BLACK], 'e4', {'d3', 'f3'}),
+])
+def test_leaper_attacks(table, square, expected):
+    assert _squares(table[Square.from_str(square).index]) == expected
+
+
+@pytest.mark.parametrize('occupied, square, expected_rook, expected_bishop', [
+    ([], 'a1', {'a2', 'a3', 'a4', 'a5', 'a6', 'a7', 'a8', 'b1', 'c1', 'd1', 'e1', 'f1', 'g1', 'h1'},
+     {'b2', 'c3', 'd4', 'e5', 'f6', 'g7', 'h8'}),
+    (['d6', 'b4', 'd2', 'g4', 'c5', 'f2'], 'd4', {'d5', 'd6', 'c4', 'b4', 'd3', 'd2', 'e4', 'f4', 'g4'},
+     {'c5', 'e5', 'f6', 'g7', 'h8', 'c3', 'b2', 'a1', 'e3', 'f2'}),
+])
+def test_rider_attacks(occupied, square, expected_rook, expected_bishop):
+    occupied = sum(1 << Square.from_str(sq).index for sq in occupied)
+    index = Square.from_str(square).index
+    assert _squares(rook_attacks(index, occupied)) == expected_rook
+    assert _squares(bishop_attacks(index, occupied)) == expected_bishop
+    assert _squares(queen_attacks(index, occupied)) == expected_rook | expected_bishop
+
+
+def test_rider_attacks_random_occupancy():
+    rnd = random.Random(1)
+    for _ in range(1000):
+        occupied = rnd.getrandbits(64) & rnd.getrandbits(64)
+        index = rnd.randrange(64)
+        assert rook_attacks(index, occupied) == _rider_attacks(index, occupied, ROOK_DIRECTIONS)
+        assert bishop_attacks(index, occupied) == _rider_attacks(index, occupied, BISHOP_DIRECTIONS)
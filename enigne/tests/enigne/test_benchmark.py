@@ -0,0 +1,23 @@
+import pytest
+
+from enigne.benchmark import BENCHMARKS, BENCHMARK_FENS, run_benchmark, run_benchmarks
+
+
+@pytest.mark.parametrize("name", list(BENCHMARKS))
+def test_run_benchmark(name):
+    result = run_benchmark(name, BENCHMARK_FENS[:2], repeat=2, warmup=1, number=1)
+    assert result['name'] == name
+    assert (result['repeat'], result['number']) == (2, 1)
+    assert result['ops'] > 0
+    assert 0 < result['min'] <= result['median'] <= result['min'] + 2 * result['stdev'] + 1e-12
+    assert result['ops_per_sec'] > 0
+
+
+def test_run_benchmark_calibration():
+    result = run_benchmark('evaluate_material', repeat=1, warmup=0, min_time=0.01)
+    assert result['number'] * result['ops'] * result['min'] >= 0.005
+
+
+def test_run_benchmarks():
+    names = ['fen', 'is_attacked']
+    assert [result['name'] for result in run_benchmarks(names, repeat=1, number=1)] == names
@@ -1,6 +1,6 @@
 import pytest
 
-from enigne.board import Board, Square, File, Rank, Move
+from enigne.board import Board, Square, File, Rank, Move, popcount, iter_bits
 from tests.conftest import basic_fens
 
 
@@ -25,6 +25,20 @@ def test_square_is_valid():
     assert not Square(File(3), Rank(8)).is_valid()
 
 
+def test_square_interned():
+    assert Square.from_str('c6') is Square.from_index(Square.from_str('c6').index)
+    assert Square.from_str('a1') + (1, 2) is Square.from_str('b3')
+    assert not (Square.from_str('h1') + (1, 0)).is_valid()
+
+
+def test_move_code():
+    move = Move.from_str('b7a8q')
+    assert Move.from_code(move.code) == move
+    assert move.code == Square.from_str('b7').index | Square.from_str('a8').index << 6 | Board.QUEEN << 12
+    assert Move.from_str('e2e4').promote is None
+    assert Move.from_str('e2e4').code < 1 << 12
+
+
 def test_move_eq():
     assert \
         Move(Square.from_str('a3'), Square.from_str('a4')) == \
@@ -105,6 +119,24 @@ def test_board_iter_pieces(basic_fen):
     assert ret == ref
 
 
+@pytest.mark.parametrize("basic_fen", basic_fens())
+def test_board_bitboards(basic_fen):
+    fen, *_ = basic_fen
+    board = Board(fen)
+    for color in (Board.WHITE, Board.BLACK):
+        occupancy = 0
+        for piece in range(Board.PAWN, Board.KING + 1):
+            bitboard = board.bitboard(piece, color)
+            assert not occupancy & bitboard
+            occupancy |= bitboard
+            assert {Square.from_index(index) for index in iter_bits(bitboard)} == {
+                square for square, pc in board.iter_pieces(color) if pc == piece
+            }
+        assert board.occupancy(color) == occupancy
+        assert popcount(occupancy) == len(list(board.iter_pieces(color)))
+    assert board.occupied == board.occupancy(Board.WHITE) | board.occupancy(Board.BLACK)
+
+
 @pytest.mark.parametrize(
     "start, end",
     [(start, end) for start, end in zip(basic_fens()[:-1], basic_fens()[1:]) if start[1] is not None]
@@ -136,3 +168,90 @@ def test_board_undo_move(start, end1, end2):
                 assert board.fen() == Board(fen3).fen()
 
     assert board.fen() == origin_fen
+
+
+@pytest.mark.parametrize("fen, moves", [
+    ('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1', ['e1c1', 'h3g2', 'e5f7', 'g2h1q']),
+    ('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1', ['a2a4', 'b4a3', 'e1g1', 'a3b2']),
+    ('8/5K1k/8/5Pp1/8/8/8/8 w - g6 0 1', ['f5g6', 'h7g6']),
+])
+def test_board_push_pop(fen, moves):
+    board = Board(fen)
+    fens = []
+    for move in moves:
+        fens.append(board.fen())
+        board.push(Move.from_str(move))
+    for _ in moves:
+        board.pop()
+        assert board.fen() == fens.pop()
+        assert board.fen() == Board(board.fen()).fen()
+        assert board.zobrist_hash == Board(board.fen()).zobrist_hash
+    reference = Board(fen)
+    assert board.occupancy(Board.WHITE) == reference.occupancy(Board.WHITE)
+    assert board.occupancy(Board.BLACK) == reference.occupancy(Board.BLACK)
+
+
+@pytest.mark.parametrize("fen, fen_after", [
+    ('r3k2r/8/8/8/4pP2/8/8/R3K2R b KQkq f3 0 1', 'r3k2r/8/8/8/4pP2/8/8/R3K2R w KQkq - 1 2'),
+    ('r3k2r/8/8/8/4pP2/8/8/R3K2R w KQkq - 3 7', 'r3k2r/8/8/8/4pP2/8/8/R3K2R b KQkq - 4 7'),
+])
+def test_board_push_pop_null(fen, fen_after):
+    board = Board(fen)
+    board.push_null()
+    assert board.fen() == fen_after
+    assert board.zobrist_hash == Board(fen_after).zobrist_hash
+    board.push(Move.from_str('h8h7' if board.turn == Board.BLACK else 'h1h2'))
+    board.pop()
+    board.pop_null()
+    assert board.fen() == fen
+    assert board.zobrist_hash == Board(fen).zobrist_hash
+
+
+def test_board_piece_bitboards():
+    board = Board('r3k2r/8/8/8/4pP2/8/8/R3K2R b KQkq f3 0 1')
+    for color in (Board.WHITE, Board.BLACK):
+        bitboards = board.piece_bitboards(color)
+        for piece in (Board.PAWN, Board.KNIGHT, Board.BISHOP, Board.ROOK, Board.QUEEN, Board.KING):
+            assert bitboards[piece] == board.bitboard(piece, color)
+
+
+def test_board_unwind():
+    fen = 'r3k2r/8/8/8/4pP2/8/8/R3K2R b KQkq f3 0 1'
+    board = Board(fen)
+    board.push(Move.from_str('e4f3'))
+    fen_after = board.fen()
+    board.push_null()
+    board.push(Move.from_str('a8a7'))
+    assert board.ply == 3
+    board.unwind(1)
+    assert board.ply == 1 and board.fen() == fen_after
+    board.unwind(0)
+    assert board.fen() == fen
+    assert board.zobrist_hash == Board(fen).zobrist_hash
+
+
+@pytest.mark.parametrize(
+    "start, end",
+    [(start, end) for start, end in zip(basic_fens()[:-1], basic_fens()[1:]) if start[1] is not None]
+)
+def test_board_zobrist_hash(start, end):
+    (start_fen, mv, *_), (end_fen, *_) = start, end
+    board = Board(start_fen)
+    start_hash = board.zobrist_hash
+    with board.do_move(Move.from_str(mv)):
+        assert board.fen() == end_fen
+        assert board.zobrist_hash == Board(end_fen).zobrist_hash
+        assert board.zobrist_hash != start_hash
+    assert board.zobrist_hash == start_hash
+
+
+def test_board_zobrist_hash_state():
+    fen = 'r3k2r/8/8/8/4pP2/8/8/R3K2R b KQkq f3 0 1'
+    hashes = {
+        Board(fen).zobrist_hash,
+        Board(fen.replace(' b ', ' w ')).zobrist_hash,
+        Board(fen.replace('KQkq', 'KQk')).zobrist_hash,
+        Board(fen.replace('f3', '-')).zobrist_hash,
+        Board(fen.replace('4pP2', '4p1P1')).zobrist_hash,
+    }
+    assert len(hashes) == 5
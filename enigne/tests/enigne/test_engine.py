@@ -23,9 +23,8 @@ def test_engine_info(engine):
 
 def test_search_blocking(engine, initial_position_fen):
     engine.modify_position(initial_position_fen)
-    start = time.perf_counter()
-    move = engine.search(depth=3)
-    assert time.perf_counter() - start > 0.03
+    move = engine.search(depth=4)
+    assert engine.search_context.nodes > 0 and not engine.search_context.halted
     board = Board(initial_position_fen)
     assert move in set(legal_move_gen(board))
 
@@ -33,13 +32,14 @@ def test_search_blocking(engine, initial_position_fen):
 def test_search_non_blocking(engine, initial_position_fen):
     engine.modify_position(initial_position_fen)
     start = time.perf_counter()
-    move = engine.search(depth=3, blocking=False)
+    # Deep enough not to be done before the first check
+    move = engine.search(depth=6, blocking=False)
     assert time.perf_counter() - start < 0.015
     assert not engine.search_done
     assert not move
     while not engine.search_done:
         time.sleep(0.003)
-    assert time.perf_counter() - start > 0.03
+    assert engine.search_context.nodes > 0 and not engine.search_context.halted
 
     board = Board(initial_position_fen)
     assert engine.search_done in set(legal_move_gen(board))
@@ -63,8 +63,9 @@ def test_search_termination(engine, initial_position_fen):
 def test_search_timeout(engine, initial_position_fen):
     engine.modify_position(initial_position_fen)
     start = time.perf_counter()
-    move = engine.search(depth=4, timeout=0.1)
+    move = engine.search(depth=10, timeout=0.1)
     assert 0.1 <= time.perf_counter() - start < 0.105
+    assert engine.search_context.halted
     board = Board(initial_position_fen)
     assert move in set(legal_move_gen(board))
 
@@ -75,14 +76,57 @@ def test_search_nodes(initial_position_fen):
     engine.set_search_visitor(visitor)
     engine.modify_position(initial_position_fen)
     start = time.perf_counter()
-    move = engine.search(depth=4, nodes=100)
+    move = engine.search(depth=8, nodes=100)
     assert visitor.nodes == 100
     assert time.perf_counter() - start < 0.1
     board = Board(initial_position_fen)
     assert move in set(legal_move_gen(board))
 
 
+def test_search_without_depth(engine, initial_position_fen):
+    board = Board(initial_position_fen)
+    engine.modify_position(initial_position_fen)
+    start = time.perf_counter()
+    assert engine.search(timeout=0.1) in set(legal_move_gen(board))
+    assert 0.1 <= time.perf_counter() - start < 0.11
+    assert engine.search_context.halted and engine.search_context.nodes > 0
+    assert engine.search(nodes=500) in set(legal_move_gen(board))
+
+
 def test_search_filter_moves(engine, initial_position_fen):
     engine.modify_position(initial_position_fen)
     move = engine.search(depth=3, filter_moves=[Move.from_str("e2e4"), Move.from_str("h2h3")])
     assert str(move) in {"e2e4", "h2h3"}
+
+
+def test_search_hash_size(initial_position_fen):
+    moves = []
+    for hash_mb in (0, 1):
+        engine = Engine(hash_mb=hash_mb)
+        engine.modify_position(initial_position_fen)
+        moves.append(engine.search(depth=3))
+        engine.new_game()
+    assert moves[0] in set(legal_move_gen(Board(initial_position_fen)))
+    assert moves[1] in set(legal_move_gen(Board(initial_position_fen)))
+
+
+def test_search_threads(initial_position_fen):
+    engine = Engine(hash_mb=1, threads=2)
+    assert engine.options() == {'Threads': f'type spin default 1 min 1 max {Engine.MAX_THREADS}'}
+    try:
+        board = Board(initial_position_fen)
+        engine.modify_position(initial_position_fen)
+        move = engine.search(depth=3)
+        assert move in set(legal_move_gen(board))
+        assert engine.pv and engine.pv[0] == move
+        assert engine.helper_nodes > 0
+
+        engine.set_option('Threads', '1')
+        assert engine.threads == 1
+        engine.set_option('Threads')
+        engine.set_option('Threads', 'many')
+        assert engine.threads == 1
+        assert engine.search(depth=3) in set(legal_move_gen(board))
+        assert engine.helper_nodes == 0
+    finally:
+        engine.quit()
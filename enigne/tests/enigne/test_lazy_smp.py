@@ -0,0 +1,59 @@
+import time
+
+import pytest
+
+from enigne.board import Board, Move
+from enigne.lazy_smp import LazySMP
+from enigne.move_gen import legal_move_gen
+from enigne.transposition import TranspositionTable
+
+
+@pytest.fixture
+def shared_table():
+    table = TranspositionTable(1, shared=True)
+    yield table
+    table.close()
+
+
+def test_lazy_smp_requires_shared_table():
+    with pytest.raises(ValueError):
+        LazySMP(1, TranspositionTable(0.01))
+
+
+def test_lazy_smp(shared_table, initial_position_fen):
+    board = Board(initial_position_fen)
+    lazy_smp = LazySMP(2, shared_table)
+    try:
+        assert lazy_smp.helpers == 2
+        assert lazy_smp.stop() is None
+
+        lazy_smp.start(board, depth=3)
+        assert lazy_smp.wait(timeout=30)
+        depth, _, code, pv = lazy_smp.stop()
+        assert depth == 3
+        assert Move.from_code(code) in set(legal_move_gen(board))
+        assert pv[0] == code
+        assert lazy_smp.nodes > 0
+        assert shared_table.probe(board.zobrist_hash) is not None
+
+        # Unbounded search is stopped
+        lazy_smp.start(board, filter_moves=[Move.from_str('h2h3')])
+        time.sleep(0.2)
+        _, _, code, _ = lazy_smp.stop()
+        assert str(Move.from_code(code)) == 'h2h3'
+    finally:
+        lazy_smp.close()
+
+
+def test_lazy_smp_dead_helper(shared_table, initial_position_fen):
+    lazy_smp = LazySMP(2, shared_table)
+    try:
+        assert lazy_smp.alive
+        lazy_smp.start(Board(initial_position_fen))
+        lazy_smp._processes[0].kill()
+        start = time.perf_counter()
+        lazy_smp.stop()
+        assert time.perf_counter() - start < LazySMP.STOP_TIMEOUT
+        assert not lazy_smp.alive
+    finally:
+        lazy_smp.close()
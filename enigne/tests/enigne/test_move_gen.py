@@ -1,8 +1,10 @@
 import pytest
 
-from enigne.board import Board, Square
-from enigne.move_gen import move_gen, attackers, is_attacked
-from enigne.perft import perft
+from enigne.board import Board, Square, Move
+from enigne.move_gen import move_gen, attackers, is_attacked, legal_move_gen, in_check, MovePicker, is_capture, \
+    capture_gen, evasion_gen
+from enigne.perft import perft, PerftHashTable, parse_epd, run_perft_suite, summarize_perft_suite, \
+    find_nps_regressions
 from tests.conftest import perfts, basic_fens
 
 
@@ -25,6 +27,189 @@ def test_attackers():
     assert not is_attacked(board, Square.from_str('a1'), Board.WHITE)
 
 
+@pytest.mark.parametrize("basic_fen", basic_fens())
+def test_attackers_match_move_gen(basic_fen):
+    fen, *_ = basic_fen
+    board = Board(fen)
+    for color in (Board.WHITE, Board.BLACK):
+        opponent = Board.WHITE if color == Board.BLACK else Board.BLACK
+        for square, _ in board.iter_pieces(opponent):
+            expected = {move.start for move in move_gen(board, color) if move.end == square}
+            assert set(attackers(board, square, color)) == expected
+            assert is_attacked(board, square, color) == bool(expected)
+
+
+def _legal_moves_by_trial(board):
+    moves = set()
+    for move in move_gen(board):
+        castling = board.own_pieces(move.start) == Board.KING and abs(move.start.file - move.end.file) == 2
+        if castling and (in_check(board) or is_attacked(
+                board, Square.from_index((move.start.index + move.end.index) // 2), board.opponent)):
+            continue
+        with board.do_move(move):
+            if not is_attacked(board, board.opponent_king_square, board.turn):
+                moves.add(str(move))
+    return moves
+
+
+@pytest.mark.parametrize("fen", [fen for fen, *_ in basic_fens() if 'K' in fen.split()[0] and 'k' in fen.split()[0]] + [
+    # Enpassant discovering check along rank, enpassant evading check, pinned pawns
+    '8/8/8/KPp4r/8/8/8/7k w - c6 0 1',
+    '8/8/8/2k5/3Pp3/8/8/4K3 b - d3 0 1',
+    '8/8/8/8/k2Pp2Q/8/8/4K3 b - d3 0 1',
+    '4k3/8/8/8/4r3/8/4P3/4K3 w - - 0 1',
+    '4k3/8/8/1b6/8/3P4/8/5K2 w - - 0 1',
+    'r3k2r/8/8/8/8/8/8/R3K1r1 w Q - 0 1',
+])
+def test_legal_move_gen(fen):
+    board = Board(fen)
+    moves = [str(move) for move in legal_move_gen(board)]
+    assert len(moves) == len(set(moves))
+    assert set(moves) == _legal_moves_by_trial(board)
+    assert board.fen() == fen
+
+
+@pytest.mark.parametrize("fen, tt_move, killers", [
+    ('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1', 'a2a3', ['e1g1', 'f3f6', 'b2b3']),
+    ('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1', 'a2a5', ['a1a8']),
+    ('r3k2r/2P3p1/8/5P2/5p2/8/2p3P1/R3K2R b KQkq - 0 1', 'c2c1q', ['e8c8']),
+    ('8/8/8/2k5/3Pp3/8/8/4K3 b - d3 0 1', None, []),
+])
+def test_move_picker(fen, tt_move, killers):
+    board = Board(fen)
+    tt_code = Move.from_str(tt_move).code if tt_move else 0
+    killer_codes = [Move.from_str(move).code for move in killers]
+    picker = MovePicker(board, tt_code, killer_codes)
+    moves, stages = [], []
+    for code in picker:
+        moves.append(code)
+        stages.append(picker.stage)
+    assert picker.stage == MovePicker.DONE
+    assert len(moves) == len(set(moves))
+    legal = {move.code for move in legal_move_gen(board)}
+    assert set(moves) == legal
+    assert stages == sorted(stages)
+    if tt_code in legal:
+        assert moves[0] == tt_code
+    for code, stage in zip(moves, stages):
+        if stage == MovePicker.CAPTURES:
+            assert is_capture(board, code)
+        elif stage == MovePicker.TACTICAL:
+            assert code >> 12 and not is_capture(board, code)
+        elif stage == MovePicker.KILLERS:
+            assert code in killer_codes
+        elif stage == MovePicker.QUIETS:
+            assert not code >> 12 and not is_capture(board, code)
+
+
+def test_move_picker_lazy():
+    board = Board('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1')
+    picker = MovePicker(board)
+    assert is_capture(board, next(iter(picker)))
+    assert picker.stage == MovePicker.CAPTURES
+
+
+_TACTICAL_FENS = [
+    'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+    'r3k2r/2P3p1/8/5P2/5p2/8/2p3P1/R3K2R b KQkq - 0 1',
+    'r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ - 0 1',
+    '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+    '4k3/8/8/8/8/8/4N3/4RK2 w - - 0 1',
+    '7k/8/8/8/8/2P5/1B6/K7 w - - 0 1',
+    '8/8/8/2k5/3Pp3/8/8/4K3 b - d3 0 1',
+    '4k3/8/3N4/1b6/8/8/8/4K3 b - - 0 1',
+    '4k3/8/3N4/8/8/8/8/4RK2 b - - 0 1',
+]
+
+
+@pytest.mark.parametrize("fen", _TACTICAL_FENS)
+@pytest.mark.parametrize("promotions, checks", [(False, False), (True, False), (True, True)])
+def test_capture_gen(fen, promotions, checks):
+    board = Board(fen)
+    moves = [str(move) for move in capture_gen(board, promotions=promotions, checks=checks)]
+    assert len(moves) == len(set(moves))
+    expected = set()
+    for move in legal_move_gen(board):
+        if is_capture(board, move.code) or promotions and move.promote is not None:
+            expected.add(str(move))
+        elif checks and move.promote is None and not (
+                board.own_pieces(move.start) == Board.KING and abs(move.start.file - move.end.file) == 2):
+            with board.do_move(move):
+                if in_check(board):
+                    expected.add(str(move))
+    assert set(moves) == expected
+
+
+@pytest.mark.parametrize("fen", _TACTICAL_FENS)
+def test_evasion_gen(fen):
+    board = Board(fen)
+    moves = {str(move) for move in evasion_gen(board)}
+    assert moves == ({str(move) for move in legal_move_gen(board)} if in_check(board) else set())
+
+
+@pytest.mark.parametrize("size_mb", [0.001, 1])
+def test_perft_hash_table(size_mb):
+    board = Board('8/5K1k/8/5Pp1/8/8/8/8 w - g6 0 1')
+    hash_table = PerftHashTable(size_mb)
+    assert perft(board, 6, hash_table=hash_table) == 22602
+    assert hash_table.hits > 0
+    assert 0 < hash_table.hit_rate < 1
+    assert perft(board, 6, hash_table=hash_table) == 22602
+    assert hash_table.size * PerftHashTable.ENTRY_SIZE <= size_mb * 2 ** 20 or hash_table.size == 2
+
+    # Statistics of worker tables are collected
+    hash_table = PerftHashTable(size_mb)
+    assert perft(board, 6, hash_table=hash_table, workers=2) == 22602
+    assert hash_table.hits > 0 and hash_table.stores > 0
+    assert 0 < hash_table.hit_rate < 1
+
+
+@pytest.mark.parametrize("depth", [2, 3])
+def test_perft_workers(depth):
+    board = Board('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1')
+    nodes, divide = perft(board, depth, divide=True, workers=2)
+    assert (nodes, divide) == perft(board, depth, divide=True)
+    assert perft(board, depth, workers=2, hash_table=PerftHashTable(1)) == nodes
+
+
+def test_parse_epd():
+    fen, expected = parse_epd('8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - ;D1 14 ;D2 191\n')
+    assert fen == '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1'
+    assert expected == {1: 14, 2: 191}
+
+    fen, expected = parse_epd('8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - bm Rxb4; id "pos3"; D1 14; c0 "D2 191"')
+    assert fen == '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1'
+    assert expected == {1: 14}
+    assert parse_epd('8/8/8/8/8/8/8/K6k w - - 5 40 ;D1 3')[0] == '8/8/8/8/8/8/8/K6k w - - 5 40'
+
+
+def test_perft_suite():
+    lines = [
+        '# comment',
+        'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1 ;D1 20 ;D2 400 ;D3 8902',
+        '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - ;D1 14 ;D2 190',
+    ]
+    results = list(run_perft_suite(lines, max_depth=2))
+    assert [(result['depth'], result['nodes'], result['ok']) for result in results] == [
+        (1, 20, True), (2, 400, True), (1, 14, True), (2, 191, False)
+    ]
+
+    summary = summarize_perft_suite(results)
+    assert (summary['positions'], summary['runs'], summary['failed'], summary['nodes']) == (2, 4, 1, 625)
+    assert find_nps_regressions(summary, summary) == []
+    assert 'hash_hit_rate' not in summary
+
+    results = list(run_perft_suite(lines, max_depth=3, hash_table=PerftHashTable(1)))
+    assert all(result['ok'] and 'hash_hit_rate' in result for result in results[:3])
+    assert summarize_perft_suite(results)['hash_probes'] == sum(result['hash_probes'] for result in results) > 0
+
+    baseline = dict(summary, nps=summary['nps'] * 2, results=[dict(results[0], nps=results[0]['nps'] * 2)])
+    regressions = find_nps_regressions(summary, baseline, threshold=0.1)
+    assert [(regression['fen'], regression['depth']) for regression in regressions] == [
+        (results[0]['fen'], 1), (None, None)
+    ]
+
+
 def _run_perft(perft_data, full=False):
     fen, node_counts, max_depth, divide_expected = perft_data
     board = Board(fen)
@@ -45,6 +230,14 @@ def test_perft(perft_data):
     _run_perft(perft_data)
 
 
+@pytest.mark.parametrize("perft_data", perfts())
+def test_perft_no_bulk(perft_data):
+    fen, node_counts, *_ = perft_data
+    board = Board(fen)
+    assert perft(board, 2, bulk=False) == perft(board, 2) == node_counts[1]
+    assert perft(board, 1, bulk=False) == perft(board, 1) == node_counts[0]
+
+
 @pytest.mark.integtest
 @pytest.mark.parametrize("perft_data", perfts())
 def test_integration_perft(perft_data):
@@ -0,0 +1,60 @@
+import pytest
+
+from enigne.board import Board, Move
+from enigne.move_gen import legal_move_gen
+from enigne.ordering import MoveOrdering, OrderedMovePicker, mvv_lva
+from tests.conftest import basic_fens
+
+
+def _code(move: str) -> int:
+    return Move.from_str(move).code
+
+
+def test_mvv_lva():
+    board = Board('4k3/8/3r1q2/2P5/4N3/8/8/4KQ2 w - - 0 1')
+    picker = OrderedMovePicker(board, MoveOrdering(), 0)
+    captures = [str(Move.from_code(code)) for code in picker if board.piece_at((code >> 6) & 63)]
+    assert captures == ['e4f6', 'f1f6', 'c5d6', 'e4d6']
+    assert mvv_lva(board, _code('c5d6')) > mvv_lva(board, _code('e4d6'))
+
+
+def test_move_ordering_cutoff():
+    board = Board('4k3/8/3r4/2P5/8/8/8/4K3 w - - 0 1')
+    ordering = MoveOrdering()
+    ordering.cutoff(board, _code('c5d6'), 3, 1)
+    assert list(ordering.ply_killers(1)) == [0, 0]
+    ordering.cutoff(board, _code('e1f1'), 3, 1)
+    ordering.cutoff(board, _code('e1f2'), 2, 1)
+    ordering.cutoff(board, _code('e1f2'), 2, 1)
+    assert list(ordering.ply_killers(1)) == [_code('e1f2'), _code('e1f1')]
+    assert list(ordering.ply_killers(0)) == [0, 0]
+    assert ordering.history_score(Board.WHITE, _code('e1f2')) == 8
+    assert ordering.history_score(Board.BLACK, _code('e1f2')) == 0
+
+    picker = OrderedMovePicker(board, ordering, 1)
+    assert [str(Move.from_code(code)) for code in picker][:3] == ['c5d6', 'e1f2', 'e1f1']
+
+    ordering.clear()
+    assert list(ordering.ply_killers(1)) == [0, 0]
+    assert ordering.history_score(Board.WHITE, _code('e1f2')) == 0
+
+
+def test_move_ordering_history_aging():
+    board = Board('4k3/8/8/8/8/8/8/4K3 w - - 0 1')
+    ordering = MoveOrdering()
+    history = ordering.history
+    for _ in range(MoveOrdering.HISTORY_MAX // 100 + 1):
+        ordering.cutoff(board, _code('e1f2'), 10, 0)
+    assert ordering.history_score(Board.WHITE, _code('e1f2')) <= MoveOrdering.HISTORY_MAX
+    # Aged in place
+    assert ordering.history is history
+
+
+@pytest.mark.parametrize("fen, _move, _expected_fen", basic_fens())
+def test_ordered_move_picker(fen, _move, _expected_fen):
+    board = Board(fen)
+    if 'k' not in fen or 'K' not in fen:
+        return
+    codes = list(OrderedMovePicker(board, MoveOrdering(), 0))
+    assert len(codes) == len(set(codes))
+    assert {Move.from_code(code) for code in codes} == set(legal_move_gen(board))
@@ -1,12 +1,17 @@
 from __future__ import annotations
 
+import math
 import time
 
 import pytest
 
 from enigne.board import Board, Move
-from enigne.search import alphabeta_search, MATE_SCORE, SearchVisitor, PVSearchVisitor, StatsSearchVisitor, \
-    BagOfSearchVisitors, FilterMovesSearchVisitor, NodesCountHaltSearchVisitor, TimeoutHaltSearchVisitor
+from enigne.move_gen import legal_move_gen
+from enigne.search import alphabeta_search, quiescence_search, iterative_deepening_search, principal_variation, \
+    SearchOptions, NO_PRUNING_SEARCH_OPTIONS, MATE_SCORE, SearchVisitor, PVSearchVisitor, StatsSearchVisitor, \
+    BagOfSearchVisitors, FilterMovesSearchVisitor, NodesCountHaltSearchVisitor, TimeoutHaltSearchVisitor, \
+    SearchHooks, VisitorSearchHooks, search_hooks, SearchContext, BagOfSearchHooks, FilterMovesSearchHooks
+from enigne.transposition import TranspositionTable
 
 
 def test_search_visitor():
@@ -167,6 +172,189 @@ def test_pv_search_visitor_in_alphabeta_search(fen, depth, expected_score, pvs):
     assert " ".join(str(mv) for mv in visitor.pv) in pvs
 
 
+@pytest.mark.parametrize('fen, depth', [
+    ('rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1', 4),
+    ('8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1', 4),
+    ('7k/4Q3/8/6K1/8/8/8/8 w - - 0 1', 4),
+])
+def test_transposition_table_in_alphabeta_search(fen, depth):
+    board = Board(fen)
+    stats = StatsSearchVisitor()
+    score = alphabeta_search(board, depth, visitor=stats, options=NO_PRUNING_SEARCH_OPTIONS)
+
+    table = TranspositionTable(1)
+    tt_stats = StatsSearchVisitor()
+    assert alphabeta_search(board, depth, visitor=tt_stats, transposition_table=table,
+                            options=NO_PRUNING_SEARCH_OPTIONS) == score
+    assert tt_stats.nodes <= stats.nodes
+    assert table.hits > 0
+
+    # Second search reuses stored results
+    tt_stats = StatsSearchVisitor()
+    assert alphabeta_search(board, depth, visitor=tt_stats, transposition_table=table,
+                            options=NO_PRUNING_SEARCH_OPTIONS) == score
+    assert tt_stats.nodes < stats.nodes
+    assert board.fen() == fen
+
+
+@pytest.mark.parametrize('hash_mb', [0, 1])
+@pytest.mark.parametrize('fen, depth', [
+    ('rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1', 3),
+    ('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1', 3),
+    ('7k/4Q3/8/6K1/8/8/8/8 w - - 0 1', 4),
+    ('7k/8/8/8/3r4/8/4r3/K7 w - - 0 1', 3),
+])
+def test_iterative_deepening_search(fen, depth, hash_mb):
+    board = Board(fen)
+    table = TranspositionTable(hash_mb) if hash_mb else None
+    pv_visitor = PVSearchVisitor()
+    score, best_move, pv = iterative_deepening_search(board, depth, visitor=pv_visitor, transposition_table=table)
+    assert score == alphabeta_search(board, depth)
+    assert best_move == pv_visitor.best_move == pv[0]
+    assert len(pv) <= depth
+    for move in pv:
+        assert move in set(legal_move_gen(board))
+        board.push_code(move.code)
+    for _ in pv:
+        board.pop()
+    assert board.fen() == fen
+    if table:
+        assert principal_variation(board, table)[:len(pv)] == pv
+
+
+def test_iterative_deepening_search_pv_first_without_table():
+    class FirstPathSearchHooks(SearchHooks):
+        node_events = True
+
+        def __init__(self):
+            self.path = []
+            self.following = True
+
+        def current_move(self, ply: int, code: int) -> None:
+            if self.following and ply == len(self.path):
+                self.path.append(code)
+            else:
+                self.following = False
+
+    hooks = FirstPathSearchHooks()
+    paths = []
+
+    def on_iteration(depth, score, best_move, pv):
+        paths.append(([move.code for move in pv], hooks.path))
+        hooks.path, hooks.following = [], True
+
+    board = Board('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1')
+    iterative_deepening_search(board, 4, visitor=hooks, options=NO_PRUNING_SEARCH_OPTIONS, on_iteration=on_iteration)
+    assert len(paths) == 4
+    for (previous_pv, _), (_, path) in zip(paths, paths[1:]):
+        assert path[:len(previous_pv)] == previous_pv
+
+
+@pytest.mark.parametrize('search', [
+    lambda board, hooks: alphabeta_search(board, 4, visitor=hooks),
+    lambda board, hooks: iterative_deepening_search(board, 4, visitor=hooks),
+    lambda board, hooks: quiescence_search(board, visitor=hooks),
+])
+def test_search_exception_unwinds_board(search):
+    class FailingSearchHooks(SearchHooks):
+        node_events = True
+
+        def current_move(self, ply: int, code: int) -> None:
+            if ply == 2:
+                raise RuntimeError('hooks failure')
+
+    fen = 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1'
+    board = Board(fen)
+    with pytest.raises(RuntimeError):
+        search(board, FailingSearchHooks())
+    assert board.fen() == fen and board.ply == 0
+    assert board.zobrist_hash == Board(fen).zobrist_hash
+
+
+def test_iterative_deepening_search_halt():
+    board = Board('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1')
+    for nodes in (1, 50, 5000):
+        visitor = NodesCountHaltSearchVisitor(nodes)
+        _, best_move, _ = iterative_deepening_search(board, visitor=visitor, transposition_table=TranspositionTable(1))
+        assert visitor.nodes == nodes
+        assert best_move in set(legal_move_gen(board))
+
+
+def test_iterative_deepening_search_mate():
+    score, best_move, pv = iterative_deepening_search(Board('7k/6Q1/6K1/8/8/8/8/8 b - - 0 1'), 3)
+    assert (score, best_move, pv) == (-MATE_SCORE, None, [])
+
+
+@pytest.mark.parametrize('fen, expected_score', [
+    # Quiet position, stand pat
+    ('4k3/8/8/8/8/8/8/R3K3 w - - 0 1', 5),
+    # Free queen
+    ('4k3/8/8/3q4/8/8/8/3RK3 w - - 0 1', 5),
+    # Pawn defended by pawn is not captured by queen
+    ('4k3/2p5/3p4/8/8/8/8/3QK3 w - - 0 1', 7),
+    # Exchange on d5: RxR, RxR
+    ('3rk3/8/8/3r4/8/8/8/3RK3 w - - 0 1', -5),
+    # Promotion
+    ('4k3/1P6/8/8/8/8/8/4K3 w - - 0 1', 9),
+    # Mate in check is found
+    ('R3k3/8/4K3/8/8/8/8/8 b - - 0 1', -MATE_SCORE),
+])
+def test_quiescence_search(fen, expected_score):
+    board = Board(fen)
+    assert quiescence_search(board) == expected_score
+    assert board.fen() == fen
+
+
+def test_quiescence_search_delta_pruning_promotion():
+    # Down by 13, only capture with promotion b7xc8=Q (gain 13) equalizes
+    board = Board('2r1k3/1P6/8/3q4/8/8/8/4K3 w - - 0 1')
+    assert quiescence_search(board) == 0
+    assert quiescence_search(board, -1, 0) == 0
+
+
+@pytest.mark.parametrize('fen, depth', [
+    ('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1', 2),
+    ('r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10', 3),
+    ('4k3/2p5/3p4/8/8/8/8/3QK3 w - - 0 1', 3),
+])
+def test_alphabeta_search_windows(fen, depth):
+    board = Board(fen)
+    score = alphabeta_search(board, depth)
+    for alpha, beta in [(score - 1, score + 1), (score - 3, score - 1), (score + 1, score + 2), (score, score + 1)]:
+        assert alphabeta_search(board, depth, alpha, beta) == min(max(score, alpha), beta)
+
+
+@pytest.mark.parametrize('option', ['null_move', 'late_move_reductions', 'futility', 'reverse_futility'])
+@pytest.mark.parametrize('fen, depth, expected_move', [
+    # Knight fork of king and queen
+    ('4k3/8/8/1q6/4N3/8/8/4K3 w - - 0 1', 4, 'e4d6'),
+    ('r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3', 4, None),
+])
+def test_selective_search(fen, depth, expected_move, option):
+    board = Board(fen)
+    full_stats = StatsSearchVisitor()
+    full_score, full_move, _ = iterative_deepening_search(board, depth, visitor=full_stats,
+                                                          options=NO_PRUNING_SEARCH_OPTIONS)
+
+    stats = StatsSearchVisitor()
+    options = SearchOptions(**{name: name == option for name in ('null_move', 'late_move_reductions', 'futility',
+                                                                 'reverse_futility')})
+    score, move, _ = iterative_deepening_search(board, depth, visitor=stats, options=options)
+    assert stats.nodes < full_stats.nodes
+    assert board.fen() == fen
+    if expected_move:
+        assert score == full_score
+        assert str(move) == str(full_move) == expected_move
+
+
+def test_alphabeta_search_horizon():
+    # Without quiescence search depth 1 search takes defended pawn by queen
+    board = Board('4k3/2p5/3p4/8/8/8/8/3QK3 w - - 0 1')
+    visitor = PVSearchVisitor()
+    assert alphabeta_search(board, 1, visitor=visitor) == 7
+    assert str(visitor.best_move) != 'd1d6'
+
+
 def test_halt_search_visitor_in_alphabeta_search():
     board = Board('7k/4Q3/8/6K1/8/8/8/8 w - - 0 1')
     visitor = BagOfSearchVisitors({
@@ -189,3 +377,145 @@ def test_filter_moves_search_visitor_in_alphabeta_search(move, initial_position_
     alphabeta_search(board, 2, visitor=visitor)
 
     assert str(pv.best_move) == move
+
+
+class RecordingSearchHooks(SearchHooks):
+    def __init__(self, node_events=False, skip_move=None):
+        self.node_events = node_events
+        self.skip_move = skip_move
+        self.root_moves = []
+        self.root_best_moves = []
+        self.nodes = 0
+        self.depth = 0
+        self.max_ply = 0
+
+    def skip_root(self, move):
+        return self.skip_move is not None and str(move) != self.skip_move
+
+    def root_move(self, move):
+        self.root_moves.append(str(move))
+
+    def root_best_move(self, score, pv, is_principal_variation=False):
+        self.root_best_moves.append((score, ' '.join(map(str, pv)), is_principal_variation))
+
+    def enter(self, ply):
+        self.depth += 1
+        self.max_ply = max(self.max_ply, ply)
+
+    def leave(self, ply):
+        self.depth -= 1
+
+    def current_move(self, ply, code):
+        self.nodes += 1
+
+
+def test_search_hooks(initial_position_fen):
+    board = Board(initial_position_fen)
+    assert type(search_hooks()) is SearchHooks
+    assert isinstance(search_hooks(SearchVisitor()), VisitorSearchHooks)
+
+    hooks = RecordingSearchHooks()
+    score = alphabeta_search(board, 3, visitor=hooks)
+    assert score == alphabeta_search(board, 3)
+    assert len(hooks.root_moves) == 20
+    assert hooks.root_best_moves[-1][0] == score and hooks.root_best_moves[-1][2]
+    assert hooks.nodes == 0 and hooks.max_ply == 0
+
+    # Node events are counted like by visitor
+    hooks = RecordingSearchHooks(node_events=True, skip_move='b2b4')
+    stats = StatsSearchVisitor()
+    alphabeta_search(board, 3, visitor=hooks)
+    alphabeta_search(board, 3, visitor=BagOfSearchVisitors({
+        'stats': stats, 'filter': FilterMovesSearchVisitor([Move.from_str('b2b4')])
+    }))
+    assert hooks.root_moves == ['b2b4']
+    assert hooks.nodes == stats.nodes
+    assert hooks.depth == 0 and hooks.max_ply >= 3
+    assert board.fen() == initial_position_fen
+
+
+def test_visitor_search_hooks():
+    visitor = PVSearchVisitor()
+    hooks = VisitorSearchHooks(visitor)
+    hooks.start()
+    hooks.enter(0)
+    hooks.current_move(0, Move.from_str('e2e4').code)
+    hooks.enter(1)
+    hooks.current_move(1, Move.from_str('e7e5').code)
+    hooks.new_best_move(1, 0, True)
+    hooks.leave(1)
+    hooks.leave(0)
+    hooks.end()
+    assert [str(move) for move in visitor.pv] == ['e2e4', 'e7e5']
+
+
+def test_search_context(initial_position_fen):
+    board = Board(initial_position_fen)
+    context = SearchContext()
+    score = alphabeta_search(board, 3, context=context)
+    assert score == alphabeta_search(board, 3)
+    assert context.nodes > 0 and not context.halted
+
+    # Nodes limit is exact, other conditions are polled every `poll_nodes` nodes
+    polls = []
+    context = SearchContext(nodes_limit=1000, poll_nodes=100, on_poll=lambda c: polls.append(c.nodes))
+    _, best_move, _ = iterative_deepening_search(board, context=context)
+    assert context.nodes == 1000 and context.halted
+    assert polls == list(range(100, 1001, 100))
+    assert best_move in set(legal_move_gen(board))
+
+    context = SearchContext(on_poll=lambda c: c.nodes >= 500)
+    iterative_deepening_search(board, context=context)
+    assert context.nodes == 512
+
+    # Polling interval shortens when deadline approaches
+    polls = []
+    context = SearchContext(timeout=0.05, on_poll=lambda c: polls.append(c.nodes))
+    start = time.perf_counter()
+    iterative_deepening_search(board, context=context)
+    assert time.perf_counter() - start >= 0.05
+    assert context.halted and context.elapsed >= 0.05
+    assert max(b - a for a, b in zip(polls, polls[1:])) == SearchContext.POLL_NODES
+
+    # 1ms per node and 10ms to deadline, next poll in at most 5 nodes
+    context = SearchContext(timeout=10)
+    now = time.monotonic()
+    context.nodes, context.start_clock, context.deadline = 1000, now - 1, now + 0.01
+    assert not context.poll()
+    assert 1 <= context.next_poll - 1000 <= 5
+
+    context = SearchContext()
+    context.stop()
+    assert alphabeta_search(board, 3, context=context) == -math.inf
+    assert context.nodes == 0
+
+
+def test_bag_of_search_hooks(initial_position_fen):
+    board = Board(initial_position_fen)
+    root_hooks = RecordingSearchHooks()
+    node_hooks = RecordingSearchHooks(node_events=True)
+    hooks = BagOfSearchHooks([root_hooks, node_hooks, FilterMovesSearchHooks([Move.from_str('e2e4')])])
+    assert hooks.node_events and not BagOfSearchHooks([root_hooks]).node_events
+    context = SearchContext()
+    alphabeta_search(board, 3, visitor=hooks, context=context)
+    assert root_hooks.root_moves == node_hooks.root_moves == ['e2e4']
+    assert root_hooks.nodes == 0 and node_hooks.nodes == context.nodes
+
+
+@pytest.mark.parametrize('fen, depth', [
+    ('r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3', 4),
+    ('8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1', 5),
+])
+def test_principal_variation_table(fen, depth):
+    board = Board(fen)
+    hooks = RecordingSearchHooks()
+    score, best_move, pv = iterative_deepening_search(board, depth, visitor=hooks)
+    assert len(pv) == depth
+    assert hooks.root_best_moves[-1] == (score, ' '.join(map(str, pv)), True)
+
+    # Variation truncated by cutoffs of transposition table is completed from it
+    table = TranspositionTable(1)
+    iterative_deepening_search(board, depth, transposition_table=table)
+    _, _, tt_pv = iterative_deepening_search(board, depth, transposition_table=table)
+    assert len(tt_pv) == depth
+    assert board.fen() == fen
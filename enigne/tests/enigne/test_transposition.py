@@ -0,0 +1,74 @@
+import multiprocessing
+import pickle
+
+import pytest
+
+from enigne.transposition import TranspositionTable, BucketHashTable
+
+
+def test_transposition_table():
+    table = TranspositionTable(1)
+    assert table.size * TranspositionTable.ENTRY_SIZE <= 2 ** 20
+    assert table.probe(0x1234) is None
+    table.store(0x1234, 3, -150, TranspositionTable.LOWER, 0x0C1C)
+    assert table.probe(0x1234) == (3, -150, TranspositionTable.LOWER, 0x0C1C)
+    table.store(0x1234, 4, 20, TranspositionTable.UPPER)
+    assert table.probe(0x1234) == (4, 20, TranspositionTable.UPPER, 0x0C1C)
+    assert (table.probes, table.hits, table.stores) == (3, 2, 2)
+    table.clear()
+    assert table.probe(0x1234) is None
+
+
+def test_bucket_hash_table_is_abstract():
+    with pytest.raises(TypeError):
+        BucketHashTable(1)
+
+
+def test_transposition_table_replacement():
+    table = TranspositionTable(0.001)
+    buckets = table.size // 2
+    deep, shallow, other = 5, 5 + buckets, 5 + 2 * buckets
+    table.store(deep, 6, 1, TranspositionTable.EXACT)
+    table.store(shallow, 2, 2, TranspositionTable.EXACT)
+    table.store(other, 1, 3, TranspositionTable.EXACT)
+    # Deep entry stays in depth preferred slot, shallow one was replaced
+    assert table.probe(deep) == (6, 1, TranspositionTable.EXACT, 0)
+    assert table.probe(shallow) is None
+    assert table.probe(other) == (1, 3, TranspositionTable.EXACT, 0)
+    table.store(other, 7, 4, TranspositionTable.EXACT)
+    assert table.probe(other) == (7, 4, TranspositionTable.EXACT, 0)
+
+
+@pytest.mark.parametrize('score', [-32767, -1, 0, 1, 32767])
+def test_transposition_table_scores(score):
+    table = TranspositionTable(0.01)
+    table.store(0xFFFFFFFFFFFFFFFF, 255, score, TranspositionTable.EXACT, 0xFFFF)
+    assert table.probe(0xFFFFFFFFFFFFFFFF) == (255, score, TranspositionTable.EXACT, 0xFFFF)
+
+
+def _probe_in_other_process(table, key, queue):
+    queue.put(table.probe(key))
+    table.store(key + 1, 2, 7, TranspositionTable.EXACT, 0x0C1C)
+
+
+def test_transposition_table_shared():
+    table = TranspositionTable(0.01, shared=True)
+    try:
+        table.store(0x1234, 3, -150, TranspositionTable.LOWER, 0x0C1C)
+        attached = TranspositionTable(0.01, name=table.name)
+        assert attached.size == table.size
+        assert attached.probe(0x1234) == (3, -150, TranspositionTable.LOWER, 0x0C1C)
+        attached.close()
+
+        context = multiprocessing.get_context('spawn')
+        queue = context.Queue()
+        process = context.Process(target=_probe_in_other_process, args=(table, 0x1234, queue))
+        process.start()
+        assert queue.get(timeout=10) == (3, -150, TranspositionTable.LOWER, 0x0C1C)
+        process.join()
+        assert table.probe(0x1235) == (2, 7, TranspositionTable.EXACT, 0x0C1C)
+    finally:
+        table.close()
+
+    with pytest.raises(TypeError):
+        pickle.dumps(TranspositionTable(0.01))
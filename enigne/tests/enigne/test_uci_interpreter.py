@@ -1,3 +1,4 @@
+import re
 import threading
 import time
 from io import StringIO
@@ -8,12 +9,12 @@ import pytest
 
 from enigne.board import Move, Board
 from enigne.engine import EngineBase, Engine
-from enigne.uci_interpreter import UciInterpreter, UciSearchVisitor
+from enigne.uci_interpreter import UciInterpreter, UciSearchHooks
 
 
 class EngineMockUp(EngineBase):
     _search_done: Optional[Move]
-    _search_visitor: UciSearchVisitor
+    _search_visitor: UciSearchHooks
 
     def __init__(self):
         super().__init__()
@@ -64,30 +65,30 @@ class EngineMockUp(EngineBase):
         assert depth == 1
 
         def do_search():
-            visitor = self._search_visitor
+            hooks = self._search_visitor
             mvs_w = [Move.from_str(mv) for mv in ['a2a4', 'b2b4', 'c2c4', 'd2d4', 'e2e4', 'f2f4', 'g2g4', 'h2h4']]
             mvs_b = [Move.from_str(mv) for mv in ['a7a5', 'b7b5', 'c7c5', 'd7d5', 'e7e5', 'f7f5', 'g7g5', 'h7h5']]
-            with visitor:
-                for mv in mvs_w:
-                    visitor.current_move(mv)
-                    with visitor.child() as child_visitor:
-                        for mv2 in mvs_b:
-                            child_visitor.current_move(mv2)
-                            time.sleep(0.005)
+            hooks.start()
+            for mv in mvs_w:
+                hooks.root_move(mv)
+                pv = [mv]
+                for mv2 in mvs_b:
+                    time.sleep(0.005)
 
-                            if str(mv) == 'e2e4' and str(mv2) == 'e7e5':
-                                child_visitor.new_best_move(10, is_principal_variation=True)
-
-                            if self._terminate_search:
-                                break
-
-                    if str(mv) == 'e2e4' or not visitor.pv.best_move:
-                        visitor.new_best_move(10, is_principal_variation=True)
+                    if str(mv) == 'e2e4' and str(mv2) == 'e7e5':
+                        pv = [mv, mv2]
 
                     if self._terminate_search:
                         break
-                assert visitor.pv.best_move
-                self._search_done = visitor.pv.best_move
+
+                if str(mv) == 'e2e4' or not hooks.best_move:
+                    hooks.root_best_move(10, pv, is_principal_variation=True)
+
+                if self._terminate_search:
+                    break
+            hooks.end()
+            assert hooks.best_move
+            self._search_done = hooks.best_move
 
         self._search_thread = threading.Thread(target=do_search, args=())
         self._terminate_search = False
@@ -150,6 +151,8 @@ def test_go_no_mockup(uci_interpreter_no_mockup):
     fout = StringIO()
     uci_interpreter_no_mockup.run(fin, fout)
     output = fout.getvalue().split('\n')
+    assert re.fullmatch(r'info depth 2 score cp -?\d+ nodes \d+ time \d+ pv \w{4} \w{4}',
+                        [line for line in output if line.startswith('info depth')][-1])
     output = list(dropwhile(lambda x: not x.startswith('bestmove'), output))[0]
     assert output in {
         f'bestmove {mv}' for mv in
@@ -168,7 +171,9 @@ def test_stop(uci_interpreter):
     start = time.perf_counter()
     uci_interpreter.run(fin, fout)
     duration = time.perf_counter() - start
-    assert 0.0051 + UciInterpreter.WAITING_STEP > duration
+    # Full search of the mockup takes 64 * 0.005 seconds
+    assert duration < 0.1
+    assert fout.getvalue().split('\n')[-2].startswith('bestmove')
 
 
 def test_uci(uci_interpreter):
@@ -195,6 +200,18 @@ def test_isready(uci_interpreter):
     assert output == ['readyok', '']
 
 
+def test_setoption(uci_interpreter_no_mockup):
+    fin = StringIO('\n'.join(['uci', 'setoption name Threads value 3', 'setoption name Unknown',
+                              'setoption name Threads', 'setoption name Threads value x', 'isready', '']))
+    fout = StringIO()
+
+    uci_interpreter_no_mockup.run(fin, fout)
+
+    assert 'option name Threads type spin default 1 min 1 max 64' in fout.getvalue().split('\n')
+    assert fout.getvalue().split('\n')[-2] == 'readyok'
+    assert uci_interpreter_no_mockup.engine.threads == 3
+
+
 def test_ucinewgame(uci_interpreter):
     fin = StringIO('\n'.join(['uci', 'ucinewgame', '']))
     fout = StringIO()